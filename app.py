@@ -1,11 +1,19 @@
 import os
 import logging
-from flask import Flask
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
+from flask_migrate import Migrate
 from flask_cors import CORS
+from flask_compress import Compress
+from sqlalchemy import func, select
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from utils.json_helpers import OrjsonProvider, dumps, loads
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -17,6 +25,7 @@ db = SQLAlchemy(model_class=Base)
 
 # Create the app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-abracadabra")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
@@ -28,26 +37,56 @@ jwt = JWTManager(app)
 # Configure CORS
 CORS(app)
 
+# Compress JSON responses; clients polling large lists send Accept-Encoding
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+Compress(app)
+
 # Configure the database
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///galaxy_of_consequence.db")
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    # Each gthread worker runs 8 request threads plus the background executor,
+    # so keep that many connections warm and allow bursts beyond it
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", 10)),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 20)),
     "pool_recycle": 300,
     "pool_pre_ping": True,
+    # JSON columns encode and decode through orjson
+    "json_serializer": dumps,
+    "json_deserializer": loads,
 }
 
 # Initialize extensions
 db.init_app(app)
+migrate = Migrate(app, db, directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+
+# Shared pool for writes that should not hold up a response, such as NPC
+# memory updates after dialogue; tasks must push their own app context
+executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bg-write")
 
 with app.app_context():
-    # Import models to ensure tables are created
+    # Import models so the migrations and the rest of the app see them
     import models
     
-    # Create all database tables
-    db.create_all()
+    # Migrations run as a separate `flask db upgrade` step before the server
+    # starts; that command imports this module too, so seed only once the
+    # schema is at the latest revision
+    with db.engine.connect() as connection:
+        current_heads = set(MigrationContext.configure(connection).get_current_heads())
+    schema_current = current_heads == set(ScriptDirectory.from_config(migrate.get_config()).get_heads())
+    
+    # Initialize default data on an empty faction table only
+    if schema_current and not db.session.execute(select(func.count()).select_from(models.FactionState)).scalar():
+        from services.faction_ai import initialize_default_factions
+        initialize_default_factions()
     
-    # Initialize default data
-    from services.faction_ai import initialize_default_factions
-    initialize_default_factions()
+    # Close the bootstrap connections so workers forked from a preloaded
+    # app (gunicorn --preload) never share a pooled connection
+    db.session.remove()
+    db.engine.dispose()
+
+# Match routes with or without a trailing slash instead of answering with a
+# redirect; rules take this default when added, so it must precede registration
+app.url_map.strict_slashes = False
 
 # Register blueprints
 from routes.auth import auth_bp
@@ -68,16 +107,25 @@ app.register_blueprint(session_bp)
 app.register_blueprint(force_bp)
 app.register_blueprint(docs_bp)
 
+# Static bodies for the root and health endpoints, serialized once at import.
+# A fresh Response is still built per request since after_request hooks mutate it.
+INDEX_BODY = orjson.dumps({
+    "message": "Galaxy of Consequence RPG Backend",
+    "version": "1.0.0",
+    "documentation": "/docs",
+    "openapi_schema": "/openapi.yaml",
+    "status": "operational"
+})
+HEALTH_BODY = orjson.dumps({"status": "healthy", "database": "connected"})
+
 @app.route('/')
 def index():
-    return {
-        "message": "Galaxy of Consequence RPG Backend",
-        "version": "1.0.0",
-        "documentation": "/docs",
-        "openapi_schema": "/openapi.yaml",
-        "status": "operational"
-    }
+    return Response(INDEX_BODY, mimetype='application/json')
 
 @app.route('/health')
 def health_check():
-    return {"status": "healthy", "database": "connected"}
+    return Response(HEALTH_BODY, mimetype='application/json')
+
+# Sort and index the URL map now, in the preloaded master, instead of on
+# each worker's first request
+app.url_map.update()
@@ -0,0 +1,76 @@
+"""Add row versions and background job tables
+
+Revision ID: 1e2ebc5178b8
+Revises: ddc3b013e48b
+Create Date: 2026-10-15 23:32:00.000000
+
+faction_state.updated_at and force_alignment.updated_at version the faction
+list ETags and cached power lookups; existing rows start at the migration
+time. faction_tick_job and quest_job hold the queued background runs.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision = '1e2ebc5178b8'
+down_revision = 'ddc3b013e48b'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ('faction_state', 'force_alignment')
+
+JSONDocument = sa.JSON().with_variant(JSONB, 'postgresql')
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+
+    now = "TIMEZONE('utc', CURRENT_TIMESTAMP)" if bind.dialect.name == 'postgresql' else 'CURRENT_TIMESTAMP'
+    for table in VERSIONED_TABLES:
+        if 'updated_at' in {c['name'] for c in inspector.get_columns(table)}:
+            continue
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = {now}")
+
+    if 'faction_tick_job' not in existing_tables:
+        op.create_table(
+            'faction_tick_job',
+            sa.Column('id', sa.String(length=32), nullable=False),
+            sa.Column('session_id', sa.String(length=255), nullable=True),
+            sa.Column('force_tick', sa.Boolean(), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('results', JSONDocument, nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'quest_job' not in existing_tables:
+        op.create_table(
+            'quest_job',
+            sa.Column('id', sa.String(length=32), nullable=False),
+            sa.Column('kind', sa.String(length=20), nullable=False),
+            sa.Column('user', sa.String(length=255), nullable=False),
+            sa.Column('quest_id', sa.Integer(), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=False),
+            sa.Column('result', JSONDocument, nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('quest_job')
+    op.drop_table('faction_tick_job')
+
+    for table in VERSIONED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
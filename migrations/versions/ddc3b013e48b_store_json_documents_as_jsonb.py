@@ -0,0 +1,90 @@
+"""Store JSON documents as JSONB
+
+Revision ID: ddc3b013e48b
+Revises: f465b42e3059
+Create Date: 2026-10-15 23:31:00.000000
+
+Galactic event affected_factions rows saved as Python list reprs are
+rewritten as JSON first. SQLite keeps JSON as text, so the column types only
+change on PostgreSQL; columns that are already JSONB are left alone.
+
+"""
+import ast
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision = 'ddc3b013e48b'
+down_revision = 'f465b42e3059'
+branch_labels = None
+depends_on = None
+
+# (table, column, value for empty rows) for every JSONDocument column
+JSON_COLUMNS = (
+    ('faction_state', 'active_operations', '[]'),
+    ('faction_state', 'strategic_goals', '[]'),
+    ('force_alignment', 'force_events', '[]'),
+    ('force_alignment', 'alignment_history', '[]'),
+    ('force_alignment', 'force_powers', '[]'),
+    ('npc_memory', 'interaction_history', '[]'),
+    ('npc_memory', 'known_player_actions', '[]'),
+    ('npc_memory', 'personality_traits', '[]'),
+    ('session_state', 'galaxy_state', '{}'),
+    ('session_state', 'active_players', '[]'),
+    ('session_state', 'major_events', '[]'),
+    ('session_state', 'faction_war_status', '{}'),
+    ('session_state', 'force_nexus_events', '[]'),
+    ('world_event', 'affected_factions', '[]'),
+)
+
+
+def _repair_affected_factions(bind):
+    rows = bind.execute(sa.text("SELECT id, affected_factions FROM world_event")).all()
+
+    updates = []
+    for row_id, stored in rows:
+        if not isinstance(stored, str):
+            continue
+        try:
+            json.loads(stored or '[]')
+        except ValueError:
+            try:
+                factions = ast.literal_eval(stored)
+            except (ValueError, SyntaxError):
+                factions = []
+            updates.append({'id': row_id, 'factions': json.dumps(list(factions))})
+
+    if updates:
+        bind.execute(sa.text("UPDATE world_event SET affected_factions = :factions WHERE id = :id"), updates)
+
+
+def upgrade():
+    bind = op.get_bind()
+    _repair_affected_factions(bind)
+
+    if bind.dialect.name != 'postgresql':
+        return
+
+    inspector = sa.inspect(bind)
+    column_types = {}
+    for table, column, empty in JSON_COLUMNS:
+        if table not in column_types:
+            column_types[table] = {c['name']: c['type'] for c in inspector.get_columns(table)}
+        if isinstance(column_types[table][column], JSONB):
+            continue
+        op.execute(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB "
+            f"USING COALESCE(NULLIF({column}, ''), '{empty}')::jsonb"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table, column, _ in JSON_COLUMNS:
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE TEXT USING {column}::text")
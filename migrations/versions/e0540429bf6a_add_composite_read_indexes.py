@@ -0,0 +1,88 @@
+"""Add composite read indexes
+
+Revision ID: e0540429bf6a
+Revises: 1e2ebc5178b8
+Create Date: 2026-10-15 23:33:00.000000
+
+Replaces single-column indexes with composites matching the newest-first
+list queries. PostgreSQL builds and drops them CONCURRENTLY outside the
+migration transaction, so the tables stay writable meanwhile.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e0540429bf6a'
+down_revision = '1e2ebc5178b8'
+branch_labels = None
+depends_on = None
+
+
+def _desc(name):
+    return sa.column(name).desc()
+
+
+def _net_alignment():
+    # Same expression as ForceAlignment.net_alignment in SQL
+    light_side_points = sa.column('light_side_points', sa.Integer())
+    dark_side_points = sa.column('dark_side_points', sa.Integer())
+    total_points = light_side_points + dark_side_points
+    return ((light_side_points - dark_side_points) * 100) // sa.case((total_points < 1, 1), else_=total_points)
+
+
+# (index, table, columns, dialect options)
+INDEXES = (
+    ('ix_canvas_user_camp_canv_ts', 'canvas_entry', ['user', 'campaign', 'canvas', _desc('timestamp')], {}),
+    ('ix_canvas_session_ts', 'canvas_entry', ['session_id', _desc('timestamp')], {}),
+    ('ix_faction_state_last_action', 'faction_state', ['last_action'], {}),
+    ('ix_quest_user_status_created', 'quest_log', ['user', 'status', _desc('created_at')], {}),
+    ('ix_quest_user_session_status', 'quest_log', ['user', 'session_id', 'status'], {}),
+    ('ix_session_updated_at', 'session_state', ['updated_at'], {}),
+    ('ix_force_alignment_net_alignment', 'force_alignment', [_net_alignment()], {}),
+    ('ix_worldevent_session_active_created', 'world_event', ['session_id', 'is_active', _desc('created_at')], {}),
+    ('ix_worldevent_active_created', 'world_event', ['is_active', _desc('created_at')], {}),
+    ('ix_worldevent_type_active_created', 'world_event', ['event_type', 'is_active', _desc('created_at')], {}),
+)
+
+# Containment lookups on affected_factions; JSONB only exists on PostgreSQL
+GIN_INDEXES = (
+    ('ix_worldevent_affected_factions', 'world_event', ['affected_factions'], {
+        'postgresql_using': 'gin', 'postgresql_ops': {'affected_factions': 'jsonb_path_ops'}
+    }),
+)
+
+# Single-column indexes that are prefixes of the composites above
+REPLACED_INDEXES = (
+    ('ix_canvas_entry_user', 'canvas_entry', ['user']),
+    ('ix_canvas_entry_campaign', 'canvas_entry', ['campaign']),
+    ('ix_canvas_entry_canvas', 'canvas_entry', ['canvas']),
+    ('ix_canvas_entry_session_id', 'canvas_entry', ['session_id']),
+    ('ix_quest_log_user', 'quest_log', ['user']),
+    ('ix_world_event_session_id', 'world_event', ['session_id']),
+)
+
+
+def _indexes():
+    if op.get_bind().dialect.name == 'postgresql':
+        return INDEXES + GIN_INDEXES
+    return INDEXES
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in _indexes():
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **options)
+
+        for name, table, _ in REPLACED_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in REPLACED_INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+        for name, table, _, _ in _indexes():
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
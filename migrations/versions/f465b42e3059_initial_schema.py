@@ -0,0 +1,190 @@
+"""Initial schema
+
+Revision ID: f465b42e3059
+Revises:
+Create Date: 2026-10-15 23:30:00.000000
+
+Databases created before migrations were introduced already have these
+tables from db.create_all(), so each table is only created when missing.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f465b42e3059'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'canvas_entry' not in existing_tables:
+        op.create_table(
+            'canvas_entry',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user', sa.String(length=255), nullable=False),
+            sa.Column('campaign', sa.String(length=255), nullable=True),
+            sa.Column('canvas', sa.String(length=255), nullable=True),
+            sa.Column('data', sa.Text(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), nullable=True),
+            sa.Column('session_id', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_canvas_entry_user', 'canvas_entry', ['user'])
+        op.create_index('ix_canvas_entry_campaign', 'canvas_entry', ['campaign'])
+        op.create_index('ix_canvas_entry_canvas', 'canvas_entry', ['canvas'])
+        op.create_index('ix_canvas_entry_session_id', 'canvas_entry', ['session_id'])
+
+    if 'faction_state' not in existing_tables:
+        op.create_table(
+            'faction_state',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('faction_name', sa.String(length=255), nullable=False),
+            sa.Column('territory_control', sa.Integer(), nullable=True),
+            sa.Column('resources', sa.Integer(), nullable=True),
+            sa.Column('influence', sa.Integer(), nullable=True),
+            sa.Column('awareness_level', sa.Integer(), nullable=True),
+            sa.Column('hostility_level', sa.Integer(), nullable=True),
+            sa.Column('active_operations', sa.Text(), nullable=True),
+            sa.Column('strategic_goals', sa.Text(), nullable=False),
+            sa.Column('last_action', sa.DateTime(), nullable=True),
+            sa.Column('faction_type', sa.String(length=100), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('faction_name')
+        )
+
+    if 'quest_log' not in existing_tables:
+        op.create_table(
+            'quest_log',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user', sa.String(length=255), nullable=False),
+            sa.Column('quest_title', sa.String(length=500), nullable=False),
+            sa.Column('quest_description', sa.Text(), nullable=False),
+            sa.Column('quest_giver', sa.String(length=255), nullable=False),
+            sa.Column('reward', sa.Text(), nullable=False),
+            sa.Column('requirements', sa.Text(), nullable=False),
+            sa.Column('status', sa.String(length=50), nullable=True),
+            sa.Column('difficulty', sa.Integer(), nullable=True),
+            sa.Column('faction_impact', sa.Text(), nullable=True),
+            sa.Column('force_impact', sa.Integer(), nullable=True),
+            sa.Column('generated_reason', sa.Text(), nullable=False),
+            sa.Column('prerequisite_events', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.Column('session_id', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_quest_log_user', 'quest_log', ['user'])
+        op.create_index('ix_quest_log_session_id', 'quest_log', ['session_id'])
+
+    if 'session_state' not in existing_tables:
+        op.create_table(
+            'session_state',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('session_id', sa.String(length=255), nullable=False),
+            sa.Column('session_name', sa.String(length=255), nullable=False),
+            sa.Column('galaxy_state', sa.Text(), nullable=False),
+            sa.Column('active_players', sa.Text(), nullable=True),
+            sa.Column('current_galactic_year', sa.Integer(), nullable=True),
+            sa.Column('major_events', sa.Text(), nullable=True),
+            sa.Column('faction_war_status', sa.Text(), nullable=True),
+            sa.Column('force_nexus_events', sa.Text(), nullable=True),
+            sa.Column('threat_escalation_level', sa.Integer(), nullable=True),
+            sa.Column('last_faction_tick', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('session_id')
+        )
+
+    if 'force_alignment' not in existing_tables:
+        op.create_table(
+            'force_alignment',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user', sa.String(length=255), nullable=False),
+            sa.Column('light_side_points', sa.Integer(), nullable=True),
+            sa.Column('dark_side_points', sa.Integer(), nullable=True),
+            sa.Column('force_sensitive', sa.Boolean(), nullable=True),
+            sa.Column('force_events', sa.Text(), nullable=True),
+            sa.Column('alignment_history', sa.Text(), nullable=True),
+            sa.Column('force_powers', sa.Text(), nullable=True),
+            sa.Column('corruption_level', sa.Integer(), nullable=True),
+            sa.Column('last_force_event', sa.DateTime(), nullable=True),
+            sa.Column('session_id', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user')
+        )
+        op.create_index('ix_force_alignment_session_id', 'force_alignment', ['session_id'])
+
+    if 'npc_memory' not in existing_tables:
+        op.create_table(
+            'npc_memory',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('npc_name', sa.String(length=255), nullable=False),
+            sa.Column('user', sa.String(length=255), nullable=False),
+            sa.Column('relationship_level', sa.Integer(), nullable=True),
+            sa.Column('trust_level', sa.Integer(), nullable=True),
+            sa.Column('fear_level', sa.Integer(), nullable=True),
+            sa.Column('interaction_history', sa.Text(), nullable=True),
+            sa.Column('known_player_actions', sa.Text(), nullable=True),
+            sa.Column('npc_faction', sa.String(length=255), nullable=True),
+            sa.Column('last_interaction', sa.DateTime(), nullable=True),
+            sa.Column('personality_traits', sa.Text(), nullable=True),
+            sa.Column('current_mood', sa.String(length=100), nullable=True),
+            sa.Column('session_id', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_npc_memory_npc_name', 'npc_memory', ['npc_name'])
+        op.create_index('ix_npc_memory_user', 'npc_memory', ['user'])
+        op.create_index('ix_npc_memory_session_id', 'npc_memory', ['session_id'])
+
+    if 'threat_level' not in existing_tables:
+        op.create_table(
+            'threat_level',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user', sa.String(length=255), nullable=False),
+            sa.Column('notoriety_level', sa.Integer(), nullable=True),
+            sa.Column('bounty_amount', sa.Integer(), nullable=True),
+            sa.Column('imperial_awareness', sa.Integer(), nullable=True),
+            sa.Column('rebel_awareness', sa.Integer(), nullable=True),
+            sa.Column('criminal_reputation', sa.Integer(), nullable=True),
+            sa.Column('active_bounties', sa.Text(), nullable=True),
+            sa.Column('escalation_triggers', sa.Text(), nullable=True),
+            sa.Column('heat_level', sa.Integer(), nullable=True),
+            sa.Column('last_escalation', sa.DateTime(), nullable=True),
+            sa.Column('session_id', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user')
+        )
+        op.create_index('ix_threat_level_session_id', 'threat_level', ['session_id'])
+
+    if 'world_event' not in existing_tables:
+        op.create_table(
+            'world_event',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('event_title', sa.String(length=500), nullable=False),
+            sa.Column('event_description', sa.Text(), nullable=False),
+            sa.Column('event_type', sa.String(length=100), nullable=False),
+            sa.Column('affected_factions', sa.Text(), nullable=True),
+            sa.Column('galactic_impact', sa.Integer(), nullable=True),
+            sa.Column('triggered_by_player', sa.String(length=255), nullable=True),
+            sa.Column('consequences', sa.Text(), nullable=True),
+            sa.Column('duration_days', sa.Integer(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('session_id', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_world_event_session_id', 'world_event', ['session_id'])
+
+
+def downgrade():
+    for table in (
+        'world_event', 'threat_level', 'npc_memory', 'force_alignment',
+        'session_state', 'quest_log', 'faction_state', 'canvas_entry'
+    ):
+        op.drop_table(table)
@@ -1,25 +1,61 @@
 from app import db
-from sqlalchemy import func
-from datetime import datetime
-import json
+from sqlalchemy import DateTime, case, func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from utils.json_helpers import loads
+
+class utcnow(FunctionElement):
+    """Current UTC time evaluated by the database, rendered inline in INSERT/UPDATE"""
+    type = DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    return 'CURRENT_TIMESTAMP'
+
+@compiles(utcnow, 'postgresql')
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+@compiles(utcnow, 'sqlite')
+def _sqlite_utcnow(element, compiler, **kw):
+    # CURRENT_TIMESTAMP only has second resolution on SQLite; pad %f's milliseconds
+    # to the six fractional digits SQLAlchemy binds, so stored values compare
+    # correctly against datetime parameters such as pagination cursors
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+# JSON document column, stored as JSONB on PostgreSQL; values come back already
+# decoded, so callers should assign a new list rather than mutate in place
+JSONDocument = db.JSON().with_variant(JSONB, 'postgresql')
 
 class CanvasEntry(db.Model):
     """Persistent game state storage for player sessions"""
+    __table_args__ = (
+        # Reads filter on a prefix of (user, campaign, canvas) and want the newest rows first
+        db.Index('ix_canvas_user_camp_canv_ts', 'user', 'campaign', 'canvas', db.desc('timestamp')),
+        db.Index('ix_canvas_session_ts', 'session_id', db.desc('timestamp')),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
-    user = db.Column(db.String(255), nullable=False, index=True)
-    campaign = db.Column(db.String(255), nullable=True, index=True)
-    canvas = db.Column(db.String(255), nullable=True, index=True)
+    user = db.Column(db.String(255), nullable=False)
+    campaign = db.Column(db.String(255), nullable=True)
+    canvas = db.Column(db.String(255), nullable=True)
     data = db.Column(db.Text, nullable=False)  # JSON serialized game state
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    session_id = db.Column(db.String(255), nullable=True, index=True)
+    timestamp = db.Column(db.DateTime, default=utcnow())
+    session_id = db.Column(db.String(255), nullable=True)
     
     def to_dict(self):
+        # data is stored as the canonical {"data": ..., "meta": ...} envelope
+        stored_data = loads(self.data) if self.data else {}
         return {
             'id': self.id,
             'user': self.user,
             'campaign': self.campaign,
             'canvas': self.canvas,
-            'data': json.loads(self.data) if self.data else {},
+            'data': stored_data.get('data', {}),
+            'meta': stored_data.get('meta', {}),
             'timestamp': self.timestamp.isoformat(),
             'session_id': self.session_id
         }
@@ -33,27 +69,47 @@ class FactionState(db.Model):
     influence = db.Column(db.Integer, default=50)  # Political influence (0-100)
     awareness_level = db.Column(db.Integer, default=0)  # Player awareness (0-100)
     hostility_level = db.Column(db.Integer, default=0)  # Hostility towards player (-100 to 100)
-    active_operations = db.Column(db.Text, default='[]')  # JSON list of current operations
-    strategic_goals = db.Column(db.Text, nullable=False)  # JSON list of faction objectives
-    last_action = db.Column(db.DateTime, default=datetime.utcnow)
+    active_operations = db.Column(JSONDocument, default=list)  # JSON list of current operations
+    strategic_goals = db.Column(JSONDocument, nullable=False)  # JSON list of faction objectives
+    last_action = db.Column(db.DateTime, default=utcnow(), index=True)  # Due factions are selected by this in SQL
     faction_type = db.Column(db.String(100), nullable=False)  # Imperial, Rebel, CSA, Hutt, etc.
-    
-    def get_operations(self):
-        return json.loads(self.active_operations) if self.active_operations else []
-    
-    def set_operations(self, operations):
-        self.active_operations = json.dumps(operations)
-    
-    def get_goals(self):
-        return json.loads(self.strategic_goals) if self.strategic_goals else []
-    
-    def set_goals(self, goals):
-        self.strategic_goals = json.dumps(goals)
+    updated_at = db.Column(db.DateTime, default=utcnow(), onupdate=utcnow())  # Version for faction list ETags
+
+class FactionTickJob(db.Model):
+    """Faction tick run queued by POST /faction_tick and polled by clients"""
+    id = db.Column(db.String(32), primary_key=True)  # uuid7 hex
+    session_id = db.Column(db.String(255), nullable=True)
+    force_tick = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, finished, failed
+    results = db.Column(JSONDocument, nullable=True)  # run_faction_tick results once finished
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=utcnow())
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class QuestJob(db.Model):
+    """Quest generation or outcome evaluation queued by the quest endpoints and polled by clients"""
+    id = db.Column(db.String(32), primary_key=True)  # uuid7 hex
+    kind = db.Column(db.String(20), nullable=False)  # generate, complete, fail
+    user = db.Column(db.String(255), nullable=False)
+    quest_id = db.Column(db.Integer, nullable=True)  # Known up front for complete/fail, set on generate
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, finished, failed
+    result = db.Column(JSONDocument, nullable=True)  # Same payload the synchronous endpoint returns
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=utcnow())
+    finished_at = db.Column(db.DateTime, nullable=True)
 
 class QuestLog(db.Model):
     """Procedurally generated and player-accepted quests"""
+    __table_args__ = (
+        # Quest lists filter by user and status and want the newest quests first;
+        # the leading user column also serves the (id, user) lookups
+        db.Index('ix_quest_user_status_created', 'user', 'status', db.desc('created_at')),
+        # Quest lists narrowed to a single session
+        db.Index('ix_quest_user_session_status', 'user', 'session_id', 'status'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
-    user = db.Column(db.String(255), nullable=False, index=True)
+    user = db.Column(db.String(255), nullable=False)
     quest_title = db.Column(db.String(500), nullable=False)
     quest_description = db.Column(db.Text, nullable=False)
     quest_giver = db.Column(db.String(255), nullable=False)  # NPC or faction
@@ -65,25 +121,30 @@ class QuestLog(db.Model):
     force_impact = db.Column(db.Integer, default=0)  # Force alignment impact (-100 to 100)
     generated_reason = db.Column(db.Text, nullable=False)  # Why this quest was generated
     prerequisite_events = db.Column(db.Text, default='[]')  # JSON list of required events
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow())
     completed_at = db.Column(db.DateTime, nullable=True)
     session_id = db.Column(db.String(255), nullable=True, index=True)
 
 class SessionState(db.Model):
     """Multiplayer session synchronization and world state"""
+    __table_args__ = (
+        # list_sessions orders every session by most recent activity
+        db.Index('ix_session_updated_at', 'updated_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(255), nullable=False, unique=True)
     session_name = db.Column(db.String(255), nullable=False)
-    galaxy_state = db.Column(db.Text, nullable=False)  # JSON serialized galaxy state
-    active_players = db.Column(db.Text, default='[]')  # JSON list of active players
+    galaxy_state = db.Column(JSONDocument, nullable=False)  # JSON galaxy state
+    active_players = db.Column(JSONDocument, default=list)  # JSON list of active players
     current_galactic_year = db.Column(db.Integer, default=0)  # Years since Battle of Yavin
-    major_events = db.Column(db.Text, default='[]')  # JSON list of galactic events
-    faction_war_status = db.Column(db.Text, default='{}')  # JSON faction relationships
-    force_nexus_events = db.Column(db.Text, default='[]')  # JSON Force-related events
+    major_events = db.Column(JSONDocument, default=list)  # JSON list of galactic events
+    faction_war_status = db.Column(JSONDocument, default=dict)  # JSON faction relationships
+    force_nexus_events = db.Column(JSONDocument, default=list)  # JSON Force-related events
     threat_escalation_level = db.Column(db.Integer, default=1)  # Galaxy-wide threat level
-    last_faction_tick = db.Column(db.DateTime, default=datetime.utcnow)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_faction_tick = db.Column(db.DateTime, default=utcnow())
+    created_at = db.Column(db.DateTime, default=utcnow())
+    updated_at = db.Column(db.DateTime, default=utcnow(), onupdate=utcnow())
 
 class ForceAlignment(db.Model):
     """Player Force sensitivity and moral choices tracking"""
@@ -92,20 +153,28 @@ class ForceAlignment(db.Model):
     light_side_points = db.Column(db.Integer, default=0)
     dark_side_points = db.Column(db.Integer, default=0)
     force_sensitive = db.Column(db.Boolean, default=False)
-    force_events = db.Column(db.Text, default='[]')  # JSON list of Force-related actions
-    alignment_history = db.Column(db.Text, default='[]')  # JSON history of alignment changes
-    force_powers = db.Column(db.Text, default='[]')  # JSON list of unlocked powers
+    force_events = db.Column(JSONDocument, default=list)  # JSON list of Force-related actions
+    alignment_history = db.Column(JSONDocument, default=list)  # JSON history of alignment changes
+    force_powers = db.Column(JSONDocument, default=list)  # JSON list of unlocked powers
     corruption_level = db.Column(db.Integer, default=0)  # Physical/mental corruption from Dark Side
     last_force_event = db.Column(db.DateTime, nullable=True)
     session_id = db.Column(db.String(255), nullable=True, index=True)
+    updated_at = db.Column(db.DateTime, default=utcnow(), onupdate=utcnow())  # Version for cached power lookups
     
-    @property
+    @hybrid_property
     def net_alignment(self):
         """Calculate net Force alignment (-100 to 100)"""
         total_points = max(1, self.light_side_points + self.dark_side_points)
         return int(((self.light_side_points - self.dark_side_points) / total_points) * 100)
     
-    @property
+    @net_alignment.inplace.expression
+    @classmethod
+    def _net_alignment_expression(cls):
+        # Integer division truncates toward zero on SQLite and PostgreSQL, like int() above
+        total_points = cls.light_side_points + cls.dark_side_points
+        return ((cls.light_side_points - cls.dark_side_points) * 100) // case((total_points < 1, 1), else_=total_points)
+    
+    @hybrid_property
     def alignment_description(self):
         """Human-readable alignment description"""
         net = self.net_alignment
@@ -119,6 +188,21 @@ class ForceAlignment(db.Model):
             return "Dark Side Leaning"
         else:
             return "Dark Side Corruption"
+    
+    @alignment_description.inplace.expression
+    @classmethod
+    def _alignment_description_expression(cls):
+        net = cls.net_alignment
+        return case(
+            (net >= 75, "Light Side Paragon"),
+            (net >= 25, "Light Side Leaning"),
+            (net >= -25, "Balanced/Gray"),
+            (net >= -75, "Dark Side Leaning"),
+            else_="Dark Side Corruption"
+        )
+
+# Lets "list dark-side players" style range queries on net_alignment use an index
+db.Index('ix_force_alignment_net_alignment', ForceAlignment.net_alignment)
 
 class NPCMemory(db.Model):
     """NPC relationship and interaction history for reactive behavior"""
@@ -128,11 +212,11 @@ class NPCMemory(db.Model):
     relationship_level = db.Column(db.Integer, default=0)  # -100 to 100
     trust_level = db.Column(db.Integer, default=0)  # 0 to 100
     fear_level = db.Column(db.Integer, default=0)  # 0 to 100
-    interaction_history = db.Column(db.Text, default='[]')  # JSON list of interactions
-    known_player_actions = db.Column(db.Text, default='[]')  # JSON list of player actions NPC knows about
+    interaction_history = db.Column(JSONDocument, default=list)  # JSON list of interactions
+    known_player_actions = db.Column(JSONDocument, default=list)  # JSON list of player actions NPC knows about
     npc_faction = db.Column(db.String(255), nullable=True)
-    last_interaction = db.Column(db.DateTime, default=datetime.utcnow)
-    personality_traits = db.Column(db.Text, default='[]')  # JSON list of NPC traits
+    last_interaction = db.Column(db.DateTime, default=utcnow())
+    personality_traits = db.Column(JSONDocument, default=list)  # JSON list of NPC traits
     current_mood = db.Column(db.String(100), default='neutral')
     session_id = db.Column(db.String(255), nullable=True, index=True)
 
@@ -148,20 +232,33 @@ class ThreatLevel(db.Model):
     active_bounties = db.Column(db.Text, default='[]')  # JSON list of bounty hunters
     escalation_triggers = db.Column(db.Text, default='[]')  # JSON list of threat escalations
     heat_level = db.Column(db.Integer, default=1)  # Current overall threat level (1-10)
-    last_escalation = db.Column(db.DateTime, default=datetime.utcnow)
+    last_escalation = db.Column(db.DateTime, default=utcnow())
     session_id = db.Column(db.String(255), nullable=True, index=True)
 
 class WorldEvent(db.Model):
     """Galaxy-wide events affecting all players"""
+    __table_args__ = (
+        # Event feeds filter by session and active flag and want the newest rows first
+        db.Index('ix_worldevent_session_active_created', 'session_id', 'is_active', db.desc('created_at')),
+        # The same feeds without a session filter, and the Force event feed
+        db.Index('ix_worldevent_active_created', 'is_active', db.desc('created_at')),
+        db.Index('ix_worldevent_type_active_created', 'event_type', 'is_active', db.desc('created_at')),
+        # "Events involving faction X" containment lookups on PostgreSQL
+        db.Index(
+            'ix_worldevent_affected_factions', 'affected_factions',
+            postgresql_using='gin', postgresql_ops={'affected_factions': 'jsonb_path_ops'}
+        ).ddl_if(dialect='postgresql'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     event_title = db.Column(db.String(500), nullable=False)
     event_description = db.Column(db.Text, nullable=False)
     event_type = db.Column(db.String(100), nullable=False)  # political, military, force, economic
-    affected_factions = db.Column(db.Text, default='[]')  # JSON list of affected factions
+    affected_factions = db.Column(JSONDocument, default=list)  # JSON list of affected factions
     galactic_impact = db.Column(db.Integer, default=1)  # 1-10 scale of impact
     triggered_by_player = db.Column(db.String(255), nullable=True)  # Which player triggered this
     consequences = db.Column(db.Text, default='[]')  # JSON list of ongoing consequences
     duration_days = db.Column(db.Integer, default=1)  # How long the event lasts
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    session_id = db.Column(db.String(255), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=utcnow())
+    session_id = db.Column(db.String(255), nullable=True)
@@ -1,10 +1,15 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app, g
+from flask_jwt_extended import create_access_token, decode_token
+from flask_jwt_extended.exceptions import NoAuthorizationError, WrongTokenError
+from functools import lru_cache
+import hmac
 
 auth_bp = Blueprint('auth', __name__)
 
 # The magical Bearer token that grants access
 MAGIC_TOKEN = "Abracadabra"
+_MAGIC_TOKEN_BYTES = MAGIC_TOKEN.encode()
+_BEARER_PREFIX = b'Bearer '
 
 @auth_bp.route('/authenticate', methods=['POST'])
 def authenticate():
@@ -16,9 +21,9 @@ def authenticate():
     if not auth_header.startswith('Bearer '):
         return jsonify({'error': 'Missing Bearer token'}), 401
     
-    token = auth_header.split('Bearer ')[1].strip()
+    token = auth_header[len('Bearer '):].strip()
     
-    if token != MAGIC_TOKEN:
+    if not hmac.compare_digest(token.encode('latin-1'), _MAGIC_TOKEN_BYTES):
         return jsonify({'error': 'Invalid Bearer token'}), 401
     
     # Create JWT token for subsequent requests
@@ -31,12 +36,12 @@ def authenticate():
     })
 
 @auth_bp.route('/verify', methods=['GET'])
-@jwt_required()
 def verify_token():
     """
     Verify JWT token is valid
     """
-    current_user = get_jwt_identity()
+    current_user = get_cached_jwt_identity()
+    
     return jsonify({
         'user': current_user,
         'status': 'authenticated',
@@ -45,12 +50,70 @@ def verify_token():
 
 def check_bearer_auth():
     """
-    Helper function to check Bearer token in requests
+    Helper function to check Bearer token in requests, memoized for the request
     """
-    auth_header = request.headers.get('Authorization', '')
+    if 'bearer_authenticated' not in g:
+        # Header values are latin-1 decoded by Werkzeug, so this round-trips exactly
+        auth_header = request.headers.get('Authorization', '').encode('latin-1')
+        g.bearer_authenticated = (
+            auth_header.startswith(_BEARER_PREFIX) and
+            hmac.compare_digest(auth_header[len(_BEARER_PREFIX):].strip(), _MAGIC_TOKEN_BYTES)
+        )
     
-    if not auth_header.startswith('Bearer '):
-        return False
+    return g.bearer_authenticated
+
+def require_bearer_token():
+    """
+    before_request hook rejecting requests without the Bearer token
+    """
+    # Let CORS preflight requests through; browsers never send credentials on them
+    if request.method == 'OPTIONS':
+        return None
+    
+    if not check_bearer_auth():
+        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
+
+@lru_cache(maxsize=4096)
+def _decode_jwt_identity(token):
+    """
+    Decode and verify an access JWT, remembering the identity for later requests
+    
+    Invalid tokens raise and are never cached.
+    """
+    claims = decode_token(token)
+    if claims['type'] != 'access':
+        raise WrongTokenError('Only non-refresh tokens are allowed')
+    
+    return claims[current_app.config['JWT_IDENTITY_CLAIM']]
+
+def get_cached_jwt_identity():
+    """
+    Helper function to resolve the JWT identity in a request without
+    re-verifying the signature of tokens that have already been seen
+    
+    A missing header or token raises NoAuthorizationError and invalid tokens
+    raise PyJWT or flask-jwt-extended errors, which the JWTManager's error
+    handlers turn into the same responses jwt_required gives.
+    """
+    header_name = current_app.config['JWT_HEADER_NAME']
+    header_type = current_app.config['JWT_HEADER_TYPE']
+    auth_header = request.headers.get(header_name, '').strip().strip(',')
+    
+    if not auth_header:
+        raise NoAuthorizationError(f"Missing {header_name} Header")
+    
+    if not auth_header.startswith(f'{header_type} '):
+        raise NoAuthorizationError(
+            f"Missing '{header_type}' type in '{header_name}' header. "
+            f"Expected '{header_name}: {header_type} <JWT>'"
+        )
+    
+    token = auth_header[len(header_type) + 1:].strip()
+    
+    # Cached identities are only valid for as long as tokens cannot expire
+    if current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES') is False:
+        decode = _decode_jwt_identity
+    else:
+        decode = _decode_jwt_identity.__wrapped__
     
-    token = auth_header.split('Bearer ')[1].strip()
-    return token == MAGIC_TOKEN
+    return decode(token)
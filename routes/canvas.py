@@ -1,12 +1,160 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from app import db
 from models import CanvasEntry
+from sqlalchemy import cast, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB
 from routes.auth import check_bearer_auth
-import json
+from utils.json_helpers import loads, dumps, parse_json_body, stream_json_list
+from utils.cache import TTLCache
 from datetime import datetime
+from itertools import count, product
+import click
+import orjson
 
 canvas_bp = Blueprint('canvas', __name__)
 
+# Required save_canvas fields and their expected JSON types
+CANVAS_FIELD_TYPES = {'canvas': str, 'user': str, 'data': dict, 'meta': dict}
+CANVAS_REQUIRED_FIELDS = frozenset(CANVAS_FIELD_TYPES)
+
+# Serialized get_canvas responses keyed by the (user, campaign, canvas) filters.
+# Each worker holds its own copy, so other workers may serve a save up to ttl late.
+_latest_canvas = TTLCache(maxsize=10000, ttl=5)
+
+# Tick of each key's latest invalidation. A read only caches its response if
+# no save invalidated the key after the read started; an entry only has to
+# outlive the slowest read, so it may expire long before a later save.
+_canvas_clock = count(1)
+_canvas_invalidated = TTLCache(maxsize=10000, ttl=60)
+
+def _invalidate_latest_canvas(user, campaign, canvas):
+    """
+    Drop every cached get_canvas response a new save for this key could change
+    """
+    tick = next(_canvas_clock)
+    
+    # get_canvas filters are optional, so any subset of the key may be cached
+    for cache_key in product((user or None, None), (campaign or None, None), (canvas or None, None)):
+        _canvas_invalidated.set(cache_key, tick)
+        _latest_canvas.pop(cache_key)
+
+def _canvas_payload_error(payload):
+    """
+    Validate a save_canvas payload, returning an error message or None
+    """
+    if not isinstance(payload, dict):
+        return 'Canvas payload must be a JSON object'
+    
+    missing_fields = CANVAS_REQUIRED_FIELDS.difference(payload)
+    if missing_fields:
+        return f'Missing required field: {", ".join(sorted(missing_fields))}'
+    
+    for field, expected_type in CANVAS_FIELD_TYPES.items():
+        if not isinstance(payload[field], expected_type):
+            return f'Field {field} must be of type {expected_type.__name__}'
+    
+    return None
+
+def _canvas_row(payload):
+    """
+    Build CanvasEntry column values from a validated save_canvas payload
+    """
+    meta = payload['meta']
+    
+    return {
+        'user': payload['user'],
+        # Extract campaign from meta if available
+        'campaign': meta.get('campaign', 'default'),
+        'canvas': payload['canvas'],
+        'data': dumps({'data': payload['data'], 'meta': meta}),
+        'session_id': payload.get('session_id')
+    }
+
+def _entry_json(entry):
+    """
+    Serialize a canvas row without re-parsing its stored envelope
+    
+    Data saved by save_canvas is already a JSON object of the form
+    {"data": ..., "meta": ...}, so its members are spliced in after the row
+    columns as raw bytes. Anything else is a legacy row that
+    `flask canvas normalize-data` has not rewritten yet; it is parsed and
+    wrapped the way that command would wrap it.
+    """
+    head = orjson.dumps({
+        'id': entry.id,
+        'user': entry.user,
+        'campaign': entry.campaign,
+        'canvas': entry.canvas,
+        'timestamp': entry.timestamp.isoformat(),
+        'session_id': entry.session_id
+    })[:-1]
+    
+    if entry.data and entry.data.startswith('{"data":'):
+        return head + b',' + entry.data[1:].encode()
+    
+    stored_data = loads(entry.data) if entry.data else {}
+    if not _is_canonical_envelope(stored_data):
+        stored_data = {'data': stored_data, 'meta': {}}
+    
+    return head + b',' + orjson.dumps({'data': stored_data['data'], 'meta': stored_data.get('meta', {})})[1:]
+
+def _force_alignment_column():
+    """
+    SQL expression for data.force_alignment inside the stored JSON envelope
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return cast(CanvasEntry.data, JSONB)['data']['force_alignment'].astext
+    
+    return func.json_extract(CanvasEntry.data, '$.data.force_alignment')
+
+def _entry_rows():
+    """
+    Select only the columns a canvas listing needs, newest first
+    
+    Plain rows skip ORM instance construction and the identity map, and
+    yield_per streams them through a server-side cursor where supported.
+    """
+    return select(
+        CanvasEntry.id,
+        CanvasEntry.user,
+        CanvasEntry.campaign,
+        CanvasEntry.canvas,
+        CanvasEntry.data,
+        CanvasEntry.timestamp,
+        CanvasEntry.session_id
+    ).order_by(CanvasEntry.timestamp.desc()).execution_options(yield_per=200)
+
+def _is_canonical_envelope(stored_data):
+    """
+    Check that stored canvas data uses the {"data": ..., "meta": ...} envelope
+    """
+    return (
+        isinstance(stored_data, dict) and
+        'data' in stored_data and
+        set(stored_data) <= {'data', 'meta'}
+    )
+
+@canvas_bp.cli.command('normalize-data')
+def normalize_canvas_data():
+    """
+    Rewrite canvas rows saved as bare game data into the canonical envelope
+    """
+    rows = db.session.execute(
+        select(CanvasEntry.id, CanvasEntry.data).execution_options(yield_per=500)
+    )
+    
+    updates = []
+    for row in rows:
+        stored_data = loads(row.data) if row.data else {}
+        if not _is_canonical_envelope(stored_data):
+            updates.append({'id': row.id, 'data': dumps({'data': stored_data, 'meta': {}})})
+    
+    for start in range(0, len(updates), 500):
+        db.session.execute(update(CanvasEntry), updates[start:start + 500])
+    db.session.commit()
+    
+    click.echo(f'Normalized {len(updates)} canvas entries')
+
 @canvas_bp.route('/save_canvas', methods=['POST'])
 def save_canvas():
     """
@@ -15,76 +163,54 @@ def save_canvas():
     if not check_bearer_auth():
         return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
     
-    data = request.get_json()
+    data = parse_json_body()
     
     # Validate required fields per RPG HUD API spec
     if not data:
         return jsonify({'error': 'Missing request body'}), 400
     
-    required_fields = ['canvas', 'user', 'data', 'meta']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
+    # A list body saves a burst of canvases in a single round trip
+    if isinstance(data, list):
+        return _save_canvas_batch(data)
     
-    user = data['user']
-    canvas = data['canvas']
-    game_data = data['data']
-    meta = data['meta']
-    
-    # Extract campaign from meta if available
-    campaign = meta.get('campaign', 'default')
-    session_id = data.get('session_id')
+    error = _canvas_payload_error(data)
+    if error:
+        return jsonify({'error': error}), 400
     
     # Create new canvas entry
-    canvas_entry = CanvasEntry{
-      "canvas": "Force HUD",
-      "user": "D'mir Hollaron",
-      "meta": {
-        "campaign": "Galaxy of Consequence – Rise of the Sith (50 ABY)",
-        "version": "v3.3",
-        "timestamp": "2025-07-30T23:59:00Z",
-        "source": "Prison Break – 1313",
-        "system_flags": {
-          "auto_save": true,
-          "sandbox_mode": false,
-          "gm_override": true
-        }
-      },
-      "data": {
-        "character": {
-          "name": "D’mir Hollaron",
-          "species": "Human",
-          "age": 18,
-          "origin": "Coruscant, Level 1313",
-          "alignment": "Dark",
-          "force_affinity": "Latent",
-          "reputation": "Imprisoned",
-          "appearance": "Youthful, Sith eyes, twin Dutch braids, scarred, brown skin",
-          "equipment": [],
-          "traits": ["Cunning", "Survivor", "Force Intuition"],
-          "goal": "Wealth",
-          "standing": "Hates syndicates, slavers, and gangs",
-          "location": "Coruscant Substructure – Prison Supply Closet, Sector 3D"
-        },
-        "session": {
-          "status": "Active",
-          "scenario": "Prison Escape - 1313",
-          "inventory": ["Encrypted Navchip"],
-          "known_contacts": ["Kelvek (mentor, missing)"],
-          "known_enemies": ["Black Sun", "Syndicates", "Slaver Cabals"],
-          "faction_clocks": {
-            "Black Sun": "Alert – Pursuit Triggered",
-            "CSA": "Monitoring – Low Signal Anomaly"
-          },
-          "force_resonance": {
-            "Byss": "Linked",
-            "Local Vergence": "Active",
-            "Sith Conclave": "Mentioned"
-          }
-        }
-      }
-    }
+    canvas_entry = CanvasEntry(**_canvas_row(data))
+    
+    db.session.add(canvas_entry)
+    db.session.commit()
+    _invalidate_latest_canvas(canvas_entry.user, canvas_entry.campaign, canvas_entry.canvas)
+    
+    return jsonify({
+        'status': 'success',
+        'message': 'Canvas saved successfully',
+        'id': str(canvas_entry.id)
+    })
 
+def _save_canvas_batch(payloads):
+    """
+    Insert several canvases with one multi-row INSERT ... RETURNING
+    """
+    for index, payload in enumerate(payloads):
+        error = _canvas_payload_error(payload)
+        if error:
+            return jsonify({'error': f'{error} (entry {index})'}), 400
+    
+    rows = [_canvas_row(payload) for payload in payloads]
+    ids = db.session.scalars(insert(CanvasEntry).returning(CanvasEntry.id, sort_by_parameter_order=True), rows).all()
+    db.session.commit()
+    
+    for row in rows:
+        _invalidate_latest_canvas(row['user'], row['campaign'], row['canvas'])
+    
+    return jsonify({
+        'status': 'success',
+        'message': f'{len(ids)} canvases saved successfully',
+        'ids': [str(canvas_id) for canvas_id in ids]
+    })
 
 @canvas_bp.route('/get_canvas', methods=['GET'])
 def get_canvas():
@@ -95,6 +221,13 @@ def get_canvas():
     campaign = request.args.get('campaign', 'default')
     canvas_type = request.args.get('canvas')
     
+    # Serve the HUD's polling reads from cache until the next save for this key
+    cache_key = (user or None, campaign or None, canvas_type or None)
+    cached = _latest_canvas.get(cache_key)
+    if cached is not None:
+        return Response(cached, mimetype='application/json')
+    
+    read_started = next(_canvas_clock)
     query = CanvasEntry.query
     
     if user:
@@ -109,22 +242,13 @@ def get_canvas():
     if not canvas_entry:
         return jsonify({'status': 'error', 'message': 'No canvas found'}), 404
     
-    # Parse the stored data
-    stored_data = json.loads(canvas_entry.data) if canvas_entry.data else {}
+    body = b'{"status":"success","canvas":' + _entry_json(canvas_entry) + b'}'
     
-    return jsonify({
-        'status': 'success',
-        'canvas': {
-            'id': canvas_entry.id,
-            'user': canvas_entry.user,
-            'campaign': canvas_entry.campaign,
-            'canvas': canvas_entry.canvas,
-            'data': stored_data.get('data', {}),
-            'meta': stored_data.get('meta', {}),
-            'timestamp': canvas_entry.timestamp.isoformat(),
-            'session_id': canvas_entry.session_id
-        }
-    })
+    # A save that committed during this read may not be in the row read here
+    if _canvas_invalidated.get(cache_key, 0) < read_started:
+        _latest_canvas.set(cache_key, body)
+    
+    return Response(body, mimetype='application/json')
 
 @canvas_bp.route('/get_canvas_by_id', methods=['GET'])
 def get_canvas_by_id():
@@ -139,27 +263,14 @@ def get_canvas_by_id():
     if not canvas_id:
         return jsonify({'error': 'Missing required parameter: id'}), 400
     
-    canvas_entry = CanvasEntry.query.get(canvas_id)
+    canvas_entry = db.session.get(CanvasEntry, canvas_id)
     
     if not canvas_entry:
         return jsonify({'status': 'error', 'message': 'Canvas not found'}), 404
     
-    # Parse the stored data
-    stored_data = json.loads(canvas_entry.data) if canvas_entry.data else {}
+    body = b'{"status":"success","canvas":' + _entry_json(canvas_entry) + b'}'
     
-    return jsonify({
-        'status': 'success',
-        'canvas': {
-            'id': canvas_entry.id,
-            'user': canvas_entry.user,
-            'campaign': canvas_entry.campaign,
-            'canvas': canvas_entry.canvas,
-            'data': stored_data.get('data', {}),
-            'meta': stored_data.get('meta', {}),
-            'timestamp': canvas_entry.timestamp.isoformat(),
-            'session_id': canvas_entry.session_id
-        }
-    })
+    return Response(body, mimetype='application/json')
 
 @canvas_bp.route('/get_canvas_history', methods=['GET'])
 def get_canvas_history():
@@ -169,36 +280,20 @@ def get_canvas_history():
     user = request.args.get('user')
     campaign = request.args.get('campaign')
     canvas_type = request.args.get('canvas')
+    limit = request.args.get('limit', type=int)
     
-    query = CanvasEntry.query
+    stmt = _entry_rows()
     
     if user:
-        query = query.filter_by(user=user)
+        stmt = stmt.where(CanvasEntry.user == user)
     if campaign:
-        query = query.filter_by(campaign=campaign)
+        stmt = stmt.where(CanvasEntry.campaign == campaign)
     if canvas_type:
-        query = query.filter_by(canvas=canvas_type)
+        stmt = stmt.where(CanvasEntry.canvas == canvas_type)
+    if limit:
+        stmt = stmt.limit(limit)
     
-    entries = query.order_by(CanvasEntry.timestamp.desc()).all()
-    
-    history = []
-    for entry in entries:
-        stored_data = json.loads(entry.data) if entry.data else {}
-        history.append({
-            'id': entry.id,
-            'user': entry.user,
-            'campaign': entry.campaign,
-            'canvas': entry.canvas,
-            'data': stored_data.get('data', {}),
-            'meta': stored_data.get('meta', {}),
-            'timestamp': entry.timestamp.isoformat(),
-            'session_id': entry.session_id
-        })
-    
-    return jsonify({
-        'status': 'success',
-        'history': history
-    })
+    return stream_json_list('history', lambda: db.session.execute(stmt), _entry_json, head={'status': 'success'})
 
 @canvas_bp.route('/get_log', methods=['GET'])
 def get_log():
@@ -208,66 +303,22 @@ def get_log():
     canvas_type = request.args.get('canvas')
     user = request.args.get('user')
     align = request.args.get('align')
+    limit = request.args.get('limit', type=int)
     
-    query = CanvasEntry.query
+    stmt = _entry_rows()
     
     if canvas_type:
-        query = query.filter_by(canvas=canvas_type)
+        stmt = stmt.where(CanvasEntry.canvas == canvas_type)
     if user:
-        query = query.filter_by(user=user)
-    
-    entries = query.order_by(CanvasEntry.timestamp.desc()).all()
-    
-    log = []
-    for entry in entries:
-        stored_data = json.loads(entry.data) if entry.data else {}
-        log.append({
-            'id': entry.id,
-            'user': entry.user,
-            'campaign': entry.campaign,
-            'canvas': entry.canvas,
-            'data': stored_data.get('data', {}),
-            'meta': stored_data.get('meta', {}),
-            'timestamp': entry.timestamp.isoformat(),
-            'session_id': entry.session_id
-        })
-    
-    return jsonify({
-        'status': 'success',
-        'log': log
-    })
-    
-    query = CanvasEntry.query
-    
-    if canvas:
-        query = query.filter_by(canvas=canvas)
-    if user:
-        query = query.filter_by(user=user)
-    
-    entries = query.order_by(CanvasEntry.timestamp.desc()).limit(50).all()
-    
-    # If alignment filter is specified, filter the data content
-    filtered_entries = []
-    for entry in entries:
-        entry_dict = entry.to_dict()
-        if align:
-            # Filter based on Force alignment in the data
-            game_data = entry_dict.get('data', {})
-            if 'force_alignment' in game_data:
-                if align.lower() in game_data['force_alignment'].lower():
-                    filtered_entries.append(entry_dict)
-            else:
-                # Include entries without alignment data if no specific filter
-                filtered_entries.append(entry_dict)
-        else:
-            filtered_entries.append(entry_dict)
-    
-    return jsonify({
-        'log_entries': filtered_entries,
-        'total_entries': len(filtered_entries),
-        'filters_applied': {
-            'canvas': canvas,
-            'user': user,
-            'alignment': align
-        }
-    })
+        stmt = stmt.where(CanvasEntry.user == user)
+    if align:
+        # Entries without alignment data are kept
+        force_alignment = _force_alignment_column()
+        stmt = stmt.where(or_(
+            force_alignment.is_(None),
+            force_alignment.icontains(align, autoescape=True)
+        ))
+    if limit:
+        stmt = stmt.limit(limit)
+    
+    return stream_json_list('log', lambda: db.session.execute(stmt), _entry_json, head={'status': 'success'})
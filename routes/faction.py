@@ -1,25 +1,135 @@
-from flask import Blueprint, request, jsonify
+import click
+import hashlib
+from flask import Blueprint, Response, request, jsonify, url_for
 from app import db
-from models import FactionState, WorldEvent
-from routes.auth import check_bearer_auth
-from services.faction_ai import run_faction_tick, get_faction_state
+from models import FactionState, FactionTickJob, WorldEvent
+from sqlalchemy import func, select
+from sqlalchemy.event import listens_for
+from sqlalchemy.orm import raiseload
+from routes.auth import require_bearer_token
+from services.faction_ai import (
+    run_faction_tick, submit_faction_tick, expire_stale_faction_tick, get_faction_state, update_faction_awareness,
+    apply_event_to_factions
+)
+from utils.cache import TTLCache
+from utils.json_helpers import json_endpoint, json_response, not_modified, stream_json_list
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+import orjson
 
 faction_bp = Blueprint('faction', __name__)
+faction_bp.before_request(require_bearer_token)
+
+# Response shapes as slotted dataclasses: orjson encodes these natively in C,
+# datetimes included, without building an intermediate dict per row
+
+@dataclass(slots=True)
+class FactionView:
+    """
+    Public representation of a faction's current state
+    """
+    name: str
+    type: str
+    territory_control: float
+    resources: int
+    influence: int
+    awareness_level: int
+    hostility_level: int
+    active_operations: list
+    strategic_goals: list
+    last_action: datetime
+    
+    @classmethod
+    def from_model(cls, faction):
+        return cls(
+            faction.faction_name,
+            faction.faction_type,
+            faction.territory_control,
+            faction.resources,
+            faction.influence,
+            faction.awareness_level,
+            faction.hostility_level,
+            faction.active_operations or [],
+            faction.strategic_goals or [],
+            faction.last_action
+        )
+
+@dataclass(slots=True)
+class GalacticEventView:
+    """
+    Public representation of a galactic event
+    """
+    id: int
+    title: str
+    description: str
+    type: str
+    affected_factions: list
+    galactic_impact: int
+    triggered_by: str
+    consequences: str
+    duration_days: int
+    is_active: bool
+    created_at: datetime
+    
+    @classmethod
+    def from_model(cls, event):
+        return cls(
+            event.id,
+            event.event_title,
+            event.event_description,
+            event.event_type,
+            event.affected_factions,
+            event.galactic_impact,
+            event.triggered_by_player,
+            event.consequences,
+            event.duration_days,
+            event.is_active,
+            event.created_at
+        )
+
+def _etag(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def _json_with_etag(body, etag):
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+# Serialized get_galactic_events bodies and their ETags; any event write drops them all
+_galactic_events = TTLCache(maxsize=1024, ttl=5)
+
+@listens_for(WorldEvent, 'after_insert')
+@listens_for(WorldEvent, 'after_update')
+def _invalidate_galactic_events(mapper, connection, target):
+    _galactic_events.clear()
+
+@faction_bp.cli.command('tick')
+@click.option('--session-id', default=None, help='Session to attach generated events to')
+@click.option('--force', is_flag=True, help='Act even if a faction moved within the tick interval')
+def tick_command(session_id, force):
+    """
+    Run one faction tick outside the web workers
+    
+    Meant for a scheduler (cron, a scheduled deployment) so the daily tick
+    fires without an inbound request. Factions that acted within the tick
+    interval are skipped, so running it more often than daily is harmless.
+    """
+    results = run_faction_tick(session_id, force)
+    click.echo(f'Faction tick produced {len(results)} results')
 
 @faction_bp.route('/faction_tick', methods=['POST'])
-def faction_tick():
+@json_endpoint(error='Failed to execute faction tick', body_optional=True)
+def faction_tick(data):
     """
     Execute real-time faction AI turns - autonomous faction simulation
-    """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
     
-    data = request.get_json()
-    session_id = data.get('session_id') if data else None
-    force_tick = data.get('force_tick', False) if data else False
+    The tick runs in the background; poll the returned status_url for results.
+    Pass "sync": true to run it inline and get the results directly.
+    """
+    session_id = data.get('session_id')
+    force_tick = data.get('force_tick', False)
     
-    try:
+    if data.get('sync', False):
         # Run faction AI simulation
         results = run_faction_tick(session_id, force_tick)
         
@@ -30,20 +140,42 @@ def faction_tick():
             'next_tick_in': '24 hours' if not force_tick else 'manual'
         })
     
-    except Exception as e:
-        return jsonify({
-            'error': 'Failed to execute faction tick',
-            'details': str(e)
-        }), 500
+    job = submit_faction_tick(session_id, force_tick)
+    
+    return json_response({
+        'message': 'Faction tick queued',
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('faction.faction_tick_status', job_id=job.id)
+    }, 202)
+
+@faction_bp.route('/faction_tick/<job_id>', methods=['GET'])
+def faction_tick_status(job_id):
+    """
+    Get the status and, once finished, the results of a queued faction tick
+    """
+    job = db.session.get(FactionTickJob, job_id)
+    if not job:
+        return jsonify({'error': 'Faction tick job not found'}), 404
+    
+    if expire_stale_faction_tick(job):
+        db.session.refresh(job)
+    
+    return json_response({
+        'job_id': job.id,
+        'status': job.status,
+        'results': job.results,
+        'error': job.error,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'next_tick_in': '24 hours' if not job.force_tick else 'manual'
+    })
 
 @faction_bp.route('/get_faction_state', methods=['GET'])
 def get_faction_state_route():
     """
     Get current state of all factions or specific faction
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
     faction_name = request.args.get('faction_name')
     session_id = request.args.get('session_id')
     
@@ -53,103 +185,74 @@ def get_faction_state_route():
         if not faction:
             return jsonify({'error': 'Faction not found'}), 404
         
-        return jsonify({
-            'faction': {
-                'name': faction.faction_name,
-                'type': faction.faction_type,
-                'territory_control': faction.territory_control,
-                'resources': faction.resources,
-                'influence': faction.influence,
-                'awareness_level': faction.awareness_level,
-                'hostility_level': faction.hostility_level,
-                'active_operations': faction.get_operations(),
-                'strategic_goals': faction.get_goals(),
-                'last_action': faction.last_action.isoformat()
-            }
-        })
+        return json_response({'faction': FactionView.from_model(faction)})
     else:
-        # Get all factions
-        factions = FactionState.query.all()
+        # Any faction write bumps updated_at, so the row count and newest
+        # timestamp version the whole list without reading it
+        count, latest = db.session.execute(
+            select(func.count(), func.max(FactionState.updated_at))
+        ).one()
+        etag = _etag(f'{count}:{latest}'.encode())
         
-        return jsonify({
-            'factions': [
-                {
-                    'name': f.faction_name,
-                    'type': f.faction_type,
-                    'territory_control': f.territory_control,
-                    'resources': f.resources,
-                    'influence': f.influence,
-                    'awareness_level': f.awareness_level,
-                    'hostility_level': f.hostility_level,
-                    'active_operations': f.get_operations(),
-                    'strategic_goals': f.get_goals(),
-                    'last_action': f.last_action.isoformat()
-                }
-                for f in factions
-            ],
-            'total_factions': len(factions)
-        })
+        response = not_modified(etag)
+        if response is not None:
+            return response
+        
+        # Get all factions, streamed as they are read
+        stmt = select(FactionState).options(raiseload('*')).execution_options(yield_per=200)
+        
+        response = stream_json_list(
+            'factions',
+            lambda: db.session.execute(stmt).scalars(),
+            lambda faction: orjson.dumps(FactionView.from_model(faction)),
+            total_key='total_factions'
+        )
+        response.set_etag(etag)
+        return response
 
 @faction_bp.route('/update_faction_relationship', methods=['POST'])
-def update_faction_relationship():
+@json_endpoint('faction_name', 'user', error='Failed to update faction relationship')
+def update_faction_relationship(data):
     """
     Update faction relationship based on player actions
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
+    faction_name = data['faction_name']
     
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
+    result = update_faction_awareness(
+        faction_name=faction_name,
+        user=data['user'],
+        relationship_change=data.get('relationship_change', 0),
+        awareness_change=data.get('awareness_change', 0),
+        action_description=data.get('action_description', ''),
+        session_id=data.get('session_id')
+    )
     
-    faction_name = data.get('faction_name')
-    user = data.get('user')
-    relationship_change = data.get('relationship_change', 0)
-    awareness_change = data.get('awareness_change', 0)
-    action_description = data.get('action_description', '')
-    session_id = data.get('session_id')
-    
-    if not all([faction_name, user]):
-        return jsonify({'error': 'Missing required fields: faction_name, user'}), 400
-    
-    try:
-        from services.faction_ai import update_faction_awareness
-        result = update_faction_awareness(
-            faction_name=faction_name,
-            user=user,
-            relationship_change=relationship_change,
-            awareness_change=awareness_change,
-            action_description=action_description,
-            session_id=session_id
-        )
-        
-        return jsonify({
-            'message': 'Faction relationship updated',
-            'faction': faction_name,
-            'new_hostility': result['new_hostility'],
-            'new_awareness': result['new_awareness'],
-            'consequences': result.get('consequences', [])
-        })
-    
-    except Exception as e:
-        return jsonify({
-            'error': 'Failed to update faction relationship',
-            'details': str(e)
-        }), 500
+    return jsonify({
+        'message': 'Faction relationship updated',
+        'faction': faction_name,
+        'new_hostility': result['new_hostility'],
+        'new_awareness': result['new_awareness'],
+        'consequences': result.get('consequences', [])
+    })
 
 @faction_bp.route('/get_galactic_events', methods=['GET'])
 def get_galactic_events():
     """
     Get current galactic events affecting factions
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
     session_id = request.args.get('session_id')
     active_only = request.args.get('active_only', 'true').lower() == 'true'
+    before = request.args.get('before')
+    
+    # Game clients poll this feed in bursts; serve repeats from the short-lived cache
+    cache_key = (session_id, active_only, before)
+    cached = _galactic_events.get(cache_key)
+    if cached is not None:
+        body, etag = cached
+        return not_modified(etag) or _json_with_etag(body, etag)
     
-    query = WorldEvent.query
+    # Serializing events must never trigger a lazy load per row
+    query = WorldEvent.query.options(raiseload('*'))
     
     if session_id:
         query = query.filter_by(session_id=session_id)
@@ -157,82 +260,58 @@ def get_galactic_events():
     if active_only:
         query = query.filter_by(is_active=True)
     
+    # Keyset pagination: pass the created_at of the last event seen to get the next page
+    if before:
+        try:
+            query = query.filter(WorldEvent.created_at < datetime.fromisoformat(before))
+        except ValueError:
+            return jsonify({'error': 'Invalid before timestamp, expected ISO 8601'}), 400
+    
     events = query.order_by(WorldEvent.created_at.desc()).limit(20).all()
     
-    return jsonify({
-        'events': [
-            {
-                'id': event.id,
-                'title': event.event_title,
-                'description': event.event_description,
-                'type': event.event_type,
-                'affected_factions': event.affected_factions,
-                'galactic_impact': event.galactic_impact,
-                'triggered_by': event.triggered_by_player,
-                'consequences': event.consequences,
-                'duration_days': event.duration_days,
-                'is_active': event.is_active,
-                'created_at': event.created_at.isoformat()
-            }
-            for event in events
-        ],
+    body = orjson.dumps({
+        'events': [GalacticEventView.from_model(event) for event in events],
         'total_events': len(events)
     })
+    etag = _etag(body)
+    _galactic_events.set(cache_key, (body, etag))
+    
+    return not_modified(etag) or _json_with_etag(body, etag)
 
 @faction_bp.route('/trigger_galactic_event', methods=['POST'])
-def trigger_galactic_event():
+@json_endpoint('title', 'description', error='Failed to trigger galactic event')
+def trigger_galactic_event(data):
     """
     Trigger a new galactic event (usually as consequence of player actions)
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
+    affected_factions = data.get('affected_factions', [])
+    impact = data.get('galactic_impact', 1)
     
-    data = request.get_json()
+    if not isinstance(affected_factions, list) or not all(isinstance(name, str) for name in affected_factions):
+        return jsonify({'error': 'affected_factions must be a list of faction names'}), 400
     
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
+    # Create new world event
+    event = WorldEvent(
+        event_title=data['title'],
+        event_description=data['description'],
+        event_type=data.get('event_type', 'political'),
+        affected_factions=affected_factions,
+        galactic_impact=impact,
+        triggered_by_player=data.get('triggered_by_player'),
+        duration_days=data.get('duration_days', 1),
+        session_id=data.get('session_id')
+    )
     
-    title = data.get('title')
-    description = data.get('description')
-    event_type = data.get('event_type', 'political')
-    affected_factions = data.get('affected_factions', [])
-    impact = data.get('galactic_impact', 1)
-    triggered_by = data.get('triggered_by_player')
-    duration = data.get('duration_days', 1)
-    session_id = data.get('session_id')
+    db.session.add(event)
+    db.session.flush()
     
-    if not all([title, description]):
-        return jsonify({'error': 'Missing required fields: title, description'}), 400
-    
-    try:
-        # Create new world event
-        event = WorldEvent(
-            event_title=title,
-            event_description=description,
-            event_type=event_type,
-            affected_factions=str(affected_factions),
-            galactic_impact=impact,
-            triggered_by_player=triggered_by,
-            duration_days=duration,
-            session_id=session_id
-        )
-        
-        db.session.add(event)
-        db.session.commit()
-        
-        # Apply immediate faction effects
-        from services.faction_ai import apply_event_to_factions
-        faction_effects = apply_event_to_factions(event)
-        
-        return jsonify({
-            'message': 'Galactic event triggered',
-            'event_id': event.id,
-            'faction_effects': faction_effects,
-            'galactic_impact': impact
-        })
+    # Apply immediate faction effects; this commits the event and the
+    # faction updates as one transaction
+    faction_effects = apply_event_to_factions(event)
     
-    except Exception as e:
-        return jsonify({
-            'error': 'Failed to trigger galactic event',
-            'details': str(e)
-        }), 500
+    return jsonify({
+        'message': 'Galactic event triggered',
+        'event_id': event.id,
+        'faction_effects': faction_effects,
+        'galactic_impact': impact
+    })
@@ -1,74 +1,61 @@
+from functools import lru_cache
 from flask import Blueprint, request, jsonify
 from app import db
 from models import ForceAlignment, WorldEvent
-from routes.auth import check_bearer_auth
-from services.force_engine import update_force_alignment, trigger_force_consequences, get_force_powers
+from sqlalchemy import select
+from sqlalchemy.orm import raiseload
+from routes.auth import require_bearer_token
+from utils.json_helpers import json_endpoint, json_response
+from services.force_engine import (
+    update_force_alignment, trigger_force_consequences, get_force_powers, generate_force_vision,
+    use_force_power as do_use_force_power, meditate as do_meditate
+)
 from datetime import datetime
 
 force_bp = Blueprint('force', __name__)
+force_bp.before_request(require_bearer_token)
+
+@lru_cache(maxsize=2048)
+def _cached_force_powers(user, version):
+    return get_force_powers(user)
 
 @force_bp.route('/update_alignment', methods=['POST'])
-def update_alignment():
+@json_endpoint('user', 'action_type', error='Failed to update Force alignment')
+def update_alignment(data):
     """
     Update player Force alignment based on actions with cascading consequences
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
-    user = data.get('user')
-    action_type = data.get('action_type')  # 'light', 'dark', 'neutral'
-    action_description = data.get('action_description', '')
-    force_magnitude = data.get('force_magnitude', 1)  # 1-10 scale of Force impact
-    witnesses = data.get('witnesses', [])  # NPCs or factions who witnessed the action
-    session_id = data.get('session_id')
-    
-    if not all([user, action_type]):
-        return jsonify({'error': 'Missing required fields: user, action_type'}), 400
+    action_type = data['action_type']  # 'light', 'dark', 'neutral'
     
-    if action_type not in ['light', 'dark', 'neutral']:
+    if action_type not in ('light', 'dark', 'neutral'):
         return jsonify({'error': 'action_type must be one of: light, dark, neutral'}), 400
     
-    try:
-        # Update Force alignment
-        result = update_force_alignment(
-            user=user,
-            action_type=action_type,
-            action_description=action_description,
-            force_magnitude=force_magnitude,
-            witnesses=witnesses,
-            session_id=session_id
-        )
-        
-        return jsonify({
-            'message': 'Force alignment updated',
-            'alignment_change': result['alignment_change'],
-            'new_alignment': result['new_alignment'],
-            'alignment_description': result['alignment_description'],
-            'force_consequences': result.get('consequences', []),
-            'unlocked_powers': result.get('unlocked_powers', []),
-            'corruption_level': result.get('corruption_level', 0),
-            'npc_reactions': result.get('npc_reactions', [])
-        })
+    # Update Force alignment
+    result = update_force_alignment(
+        user=data['user'],
+        action_type=action_type,
+        action_description=data.get('action_description', ''),
+        force_magnitude=data.get('force_magnitude', 1),  # 1-10 scale of Force impact
+        witnesses=data.get('witnesses', []),  # NPCs or factions who witnessed the action
+        session_id=data.get('session_id')
+    )
     
-    except Exception as e:
-        return jsonify({
-            'error': 'Failed to update Force alignment',
-            'details': str(e)
-        }), 500
+    return jsonify({
+        'message': 'Force alignment updated',
+        'alignment_change': result['alignment_change'],
+        'new_alignment': result['new_alignment'],
+        'alignment_description': result['alignment_description'],
+        'force_consequences': result.get('consequences', []),
+        'unlocked_powers': result.get('unlocked_powers', []),
+        'corruption_level': result.get('corruption_level', 0),
+        'npc_reactions': result.get('npc_reactions', [])
+    })
 
 @force_bp.route('/get_alignment', methods=['GET'])
 def get_alignment():
     """
     Get player's current Force alignment and history
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
     user = request.args.get('user')
     session_id = request.args.get('session_id')
     
@@ -86,9 +73,7 @@ def get_alignment():
         db.session.add(alignment)
         db.session.commit()
     
-    import json
-    
-    return jsonify({
+    return json_response({
         'user': user,
         'force_sensitive': alignment.force_sensitive,
         'light_side_points': alignment.light_side_points,
@@ -96,125 +81,85 @@ def get_alignment():
         'net_alignment': alignment.net_alignment,
         'alignment_description': alignment.alignment_description,
         'corruption_level': alignment.corruption_level,
-        'force_events': json.loads(alignment.force_events),
-        'alignment_history': json.loads(alignment.alignment_history),
-        'force_powers': json.loads(alignment.force_powers),
-        'last_force_event': alignment.last_force_event.isoformat() if alignment.last_force_event else None
+        'force_events': alignment.force_events or [],
+        'alignment_history': alignment.alignment_history or [],
+        'force_powers': alignment.force_powers or [],
+        'last_force_event': alignment.last_force_event
     })
 
 @force_bp.route('/trigger_force_vision', methods=['POST'])
-def trigger_force_vision():
+@json_endpoint('user', error='Failed to trigger Force vision')
+def trigger_force_vision(data):
     """
     Trigger Force vision based on current alignment and galaxy state
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
-    user = data.get('user')
-    vision_trigger = data.get('trigger', 'meditation')  # meditation, stress, combat, location
-    session_id = data.get('session_id')
-    
-    if not user:
-        return jsonify({'error': 'Missing required field: user'}), 400
+    vision_result = generate_force_vision(
+        user=data['user'],
+        trigger=data.get('trigger', 'meditation'),  # meditation, stress, combat, location
+        session_id=data.get('session_id')
+    )
     
-    try:
-        from services.force_engine import generate_force_vision
-        vision_result = generate_force_vision(
-            user=user,
-            trigger=vision_trigger,
-            session_id=session_id
-        )
-        
-        if not vision_result:
-            return jsonify({'message': 'No Force vision manifested at this time'}), 200
-        
-        return jsonify({
-            'message': 'Force vision experienced',
-            'vision': vision_result['vision_text'],
-            'vision_type': vision_result['vision_type'],
-            'future_hints': vision_result.get('future_hints', []),
-            'alignment_requirement': vision_result.get('alignment_requirement'),
-            'force_magnitude': vision_result.get('force_magnitude', 1)
-        })
+    if not vision_result:
+        return jsonify({'message': 'No Force vision manifested at this time'}), 200
     
-    except Exception as e:
-        return jsonify({
-            'error': 'Failed to trigger Force vision',
-            'details': str(e)
-        }), 500
+    return jsonify({
+        'message': 'Force vision experienced',
+        'vision': vision_result['vision_text'],
+        'vision_type': vision_result['vision_type'],
+        'future_hints': vision_result.get('future_hints', []),
+        'alignment_requirement': vision_result.get('alignment_requirement'),
+        'force_magnitude': vision_result.get('force_magnitude', 1)
+    })
 
 @force_bp.route('/use_force_power', methods=['POST'])
-def use_force_power():
+@json_endpoint('user', 'power_name', error='Failed to use Force power')
+def use_force_power(data):
     """
     Use a Force power with alignment consequences
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
+    power_name = data['power_name']
     
-    data = request.get_json()
+    power_result = do_use_force_power(
+        user=data['user'],
+        power_name=power_name,
+        target=data.get('target', ''),  # Target of the power (NPC, object, etc.)
+        intent=data.get('intent', 'neutral'),  # 'light', 'dark', 'neutral'
+        power_level=data.get('power_level', 1),  # 1-10 intensity
+        session_id=data.get('session_id')
+    )
     
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
-    user = data.get('user')
-    power_name = data.get('power_name')
-    target = data.get('target', '')  # Target of the power (NPC, object, etc.)
-    intent = data.get('intent', 'neutral')  # 'light', 'dark', 'neutral'
-    power_level = data.get('power_level', 1)  # 1-10 intensity
-    session_id = data.get('session_id')
-    
-    if not all([user, power_name]):
-        return jsonify({'error': 'Missing required fields: user, power_name'}), 400
-    
-    try:
-        from services.force_engine import use_force_power
-        power_result = use_force_power(
-            user=user,
-            power_name=power_name,
-            target=target,
-            intent=intent,
-            power_level=power_level,
-            session_id=session_id
-        )
-        
-        return jsonify({
-            'message': f'Force power "{power_name}" used',
-            'success': power_result['success'],
-            'effect_description': power_result['effect_description'],
-            'alignment_change': power_result.get('alignment_change', 0),
-            'force_cost': power_result.get('force_cost', 0),
-            'consequences': power_result.get('consequences', []),
-            'witnesses_affected': power_result.get('witnesses_affected', [])
-        })
-    
-    except Exception as e:
-        return jsonify({
-            'error': 'Failed to use Force power',
-            'details': str(e)
-        }), 500
+    return jsonify({
+        'message': f'Force power "{power_name}" used',
+        'success': power_result['success'],
+        'effect_description': power_result['effect_description'],
+        'alignment_change': power_result.get('alignment_change', 0),
+        'force_cost': power_result.get('force_cost', 0),
+        'consequences': power_result.get('consequences', []),
+        'witnesses_affected': power_result.get('witnesses_affected', [])
+    })
 
 @force_bp.route('/get_available_powers', methods=['GET'])
 def get_available_powers():
     """
     Get Force powers available to player based on alignment and experience
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
     user = request.args.get('user')
     
     if not user:
         return jsonify({'error': 'Missing required parameter: user'}), 400
     
     try:
-        powers = get_force_powers(user)
+        # Power availability only changes with the alignment row, so key the
+        # cached result on its updated_at; any write yields a fresh entry
+        row = db.session.execute(
+            select(ForceAlignment.updated_at).filter_by(user=user)
+        ).one_or_none()
+        if row is not None and row.updated_at is None:
+            powers = get_force_powers(user)
+        else:
+            powers = _cached_force_powers(user, row.updated_at if row else None)
         
-        return jsonify({
+        return json_response({
             'available_powers': powers['available'],
             'locked_powers': powers['locked'],
             'alignment_requirements': powers['requirements'],
@@ -232,20 +177,17 @@ def get_force_nexus_events():
     """
     Get Force-related galactic events affecting the galaxy
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
     session_id = request.args.get('session_id')
     
     # Get Force-related world events
-    query = WorldEvent.query.filter_by(event_type='force', is_active=True)
+    query = WorldEvent.query.options(raiseload('*')).filter_by(event_type='force', is_active=True)
     
     if session_id:
         query = query.filter_by(session_id=session_id)
     
     events = query.order_by(WorldEvent.created_at.desc()).limit(10).all()
     
-    return jsonify({
+    return json_response({
         'force_events': [
             {
                 'id': event.id,
@@ -254,7 +196,7 @@ def get_force_nexus_events():
                 'galactic_impact': event.galactic_impact,
                 'triggered_by': event.triggered_by_player,
                 'consequences': event.consequences,
-                'created_at': event.created_at.isoformat()
+                'created_at': event.created_at
             }
             for event in events
         ],
@@ -262,48 +204,24 @@ def get_force_nexus_events():
     })
 
 @force_bp.route('/meditate', methods=['POST'])
-def meditate():
+@json_endpoint('user', error='Failed to complete meditation')
+def meditate(data):
     """
     Force meditation for alignment balancing and visions
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
-    user = data.get('user')
-    meditation_type = data.get('type', 'balance')  # balance, light, dark, vision_seeking
-    duration = data.get('duration', 'short')  # short, medium, long
-    location = data.get('location', 'unknown')  # Force nexus affects meditation
-    session_id = data.get('session_id')
-    
-    if not user:
-        return jsonify({'error': 'Missing required field: user'}), 400
-    
-    try:
-        from services.force_engine import meditate
-        meditation_result = meditate(
-            user=user,
-            meditation_type=meditation_type,
-            duration=duration,
-            location=location,
-            session_id=session_id
-        )
-        
-        return jsonify({
-            'message': 'Meditation completed',
-            'meditation_outcome': meditation_result['outcome'],
-            'alignment_change': meditation_result.get('alignment_change', 0),
-            'visions_received': meditation_result.get('visions', []),
-            'force_clarity': meditation_result.get('force_clarity', 0),
-            'location_bonus': meditation_result.get('location_bonus', 0)
-        })
+    meditation_result = do_meditate(
+        user=data['user'],
+        meditation_type=data.get('type', 'balance'),  # balance, light, dark, vision_seeking
+        duration=data.get('duration', 'short'),  # short, medium, long
+        location=data.get('location', 'unknown'),  # Force nexus affects meditation
+        session_id=data.get('session_id')
+    )
     
-    except Exception as e:
-        return jsonify({
-            'error': 'Failed to complete meditation',
-            'details': str(e)
-        }), 500
+    return jsonify({
+        'message': 'Meditation completed',
+        'meditation_outcome': meditation_result['outcome'],
+        'alignment_change': meditation_result.get('alignment_change', 0),
+        'visions_received': meditation_result.get('visions', []),
+        'force_clarity': meditation_result.get('force_clarity', 0),
+        'location_bonus': meditation_result.get('location_bonus', 0)
+    })
@@ -1,34 +1,20 @@
-from flask import Blueprint, request, jsonify, Response
-from routes.auth import check_bearer_auth
-from utils.nvidia_client import query_nemotron_streaming
-from services.npc_memory import update_npc_interaction
-import json
+from flask import Blueprint, request, jsonify
+from routes.auth import require_bearer_token
+from utils.json_helpers import json_endpoint
+from utils.nvidia_client import query_nemotron_streaming, query_nemotron_direct
+from services.npc_memory import update_npc_interaction, submit_npc_interaction, fetch_npc_dialogue_context
 
 nemotron_bp = Blueprint('nemotron', __name__)
+nemotron_bp.before_request(require_bearer_token)
 
 @nemotron_bp.route('/query_nemotron', methods=['POST'])
-def query_nemotron():
+@json_endpoint('message', error='Failed to query Nemotron')
+def query_nemotron(data):
     """
     Generate immersive, lore-accurate NPC dialogue
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
     # Extract message field as per RPG HUD API spec
-    message = data.get('message')
-    if not message:
-        return jsonify({'error': 'Missing required field: message'}), 400
-    
-    # Optional parameters
-    model = data.get('model', 'nvidia/nemotron-mini-4b-instruct')
-    temperature = data.get('temperature', 0.2)
-    top_p = data.get('top_p', 0.7)
-    max_tokens = data.get('max_tokens', 1024)
+    message = data['message']
     
     # Optional game context fields
     user = data.get('user')
@@ -50,69 +36,60 @@ def query_nemotron():
     
     # Prepare payload for NVIDIA API
     payload = {
-        'model': model,
+        'model': data.get('model', 'nvidia/nemotron-mini-4b-instruct'),
         'messages': messages,
-        'temperature': temperature,
-        'top_p': top_p,
-        'max_tokens': max_tokens,
+        'temperature': data.get('temperature', 0.2),
+        'top_p': data.get('top_p', 0.7),
+        'max_tokens': data.get('max_tokens', 1024),
         'stream': False  # Non-streaming for RPG HUD API compatibility
     }
     
-    try:
-        # Get non-streaming response
-        from utils.nvidia_client import query_nemotron_direct
-        response = query_nemotron_direct(payload)
-        
-        # Update NPC memory if context provided
-        if user and npc_name and response.get('choices'):
-            full_response = response['choices'][0]['message']['content']
-            update_npc_interaction(
-                npc_name=npc_name,
-                user=user,
-                interaction_type='dialogue',
-                interaction_data={
-                    'player_message': message,
-                    'npc_response': full_response,
-                    'context': str(context)
-                },
-                session_id=session_id
-            )
-        
-        # Return response in RPG HUD API format
-        return jsonify(response)
-    
-    except Exception as e:
+    # Get non-streaming response
+    response = query_nemotron_direct(payload)
+    
+    # Record the exchange in NPC memory off the request path; the reply
+    # does not depend on the updated relationship values
+    if user and npc_name and response.get('choices'):
+        full_response = response['choices'][0]['message']['content']
+        submit_npc_interaction(
+            npc_name=npc_name,
+            user=user,
+            interaction_type='dialogue',
+            interaction_data={
+                'player_message': message,
+                'npc_response': full_response,
+                'context': str(context)
+            },
+            session_id=session_id
+        )
+    
+    # ?format=text trims the OpenAI-style envelope down to the reply text
+    # and its metadata for clients that only render the dialogue
+    if request.args.get('format') == 'text':
+        choice = (response.get('choices') or [{}])[0]
         return jsonify({
-            'error': 'Failed to query Nemotron',
-            'details': str(e)
-        }), 500
+            'content': choice.get('message', {}).get('content', ''),
+            'finish_reason': choice.get('finish_reason'),
+            'usage': response.get('usage')
+        })
+    
+    # Return response in RPG HUD API format
+    return jsonify(response)
 
 @nemotron_bp.route('/generate_npc_dialogue', methods=['POST'])
-def generate_npc_dialogue():
+@json_endpoint('user', 'npc_name', error='Failed to generate NPC dialogue')
+def generate_npc_dialogue(data):
     """
     Generate contextual NPC dialogue based on game state and NPC memory
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
-    user = data.get('user')
-    npc_name = data.get('npc_name')
+    user = data['user']
+    npc_name = data['npc_name']
     situation = data.get('situation', '')
     player_action = data.get('player_action', '')
     session_id = data.get('session_id')
     
-    if not all([user, npc_name]):
-        return jsonify({'error': 'Missing required fields: user, npc_name'}), 400
-    
-    # Get NPC memory and build context
-    from services.npc_memory import get_npc_memory, build_npc_context
-    npc_memory = get_npc_memory(npc_name, user, session_id)
-    context = build_npc_context(npc_memory, situation, player_action)
+    # Load NPC memory and build context from a single query
+    npc_memory, context = fetch_npc_dialogue_context(npc_name, user, situation, player_action, session_id)
     
     # Build messages for Nemotron
     messages = [
@@ -136,37 +113,31 @@ def generate_npc_dialogue():
         'stream': False
     }
     
-    try:
-        response = query_nemotron_streaming(payload, stream=False)
-        
-        npc_response = ""
-        if 'choices' in response and response['choices']:
-            npc_response = response['choices'][0].get('message', {}).get('content', '')
-        
-        # Update NPC memory with this interaction
-        if npc_response:
-            update_npc_interaction(
-                npc_name=npc_name,
-                user=user,
-                interaction_type='contextual_dialogue',
-                interaction_data={
-                    'situation': situation,
-                    'player_action': player_action,
-                    'npc_response': npc_response,
-                    'relationship_change': context.get('relationship_change', 0)
-                },
-                session_id=session_id
-            )
-        
-        return jsonify({
-            'npc_name': npc_name,
-            'dialogue': npc_response,
-            'context': context['metadata'],
-            'relationship_status': npc_memory.relationship_level if npc_memory else 0
-        })
-    
-    except Exception as e:
-        return jsonify({
-            'error': 'Failed to generate NPC dialogue',
-            'details': str(e)
-        }), 500
+    response = query_nemotron_streaming(payload, stream=False)
+    
+    npc_response = ""
+    if 'choices' in response and response['choices']:
+        npc_response = response['choices'][0].get('message', {}).get('content', '')
+    
+    # Update NPC memory with this interaction
+    if npc_response:
+        update_npc_interaction(
+            npc_name=npc_name,
+            user=user,
+            interaction_type='contextual_dialogue',
+            interaction_data={
+                'situation': situation,
+                'player_action': player_action,
+                'npc_response': npc_response,
+                'relationship_change': context.get('relationship_change', 0)
+            },
+            session_id=session_id,
+            npc_memory=npc_memory
+        )
+    
+    return jsonify({
+        'npc_name': npc_name,
+        'dialogue': npc_response,
+        'context': context['metadata'],
+        'relationship_status': npc_memory.relationship_level if npc_memory else 0
+    })
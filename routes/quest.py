@@ -1,82 +1,91 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for
 from app import db
-from models import QuestLog, ForceAlignment, FactionState
-from routes.auth import check_bearer_auth
-from services.quest_generator import generate_procedural_quest, evaluate_quest_completion
+from models import QuestLog, QuestJob, ForceAlignment, FactionState
+from sqlalchemy import insert, select
+from routes.auth import require_bearer_token
+from utils.db_helpers import before_keyset_cursor, keyset_cursor
+from utils.json_helpers import json_endpoint, json_response, stream_json_list
+from services.quest_generator import (
+    build_quest_values, complete_quest_outcome, create_procedural_quest, expire_stale_quest_job,
+    fail_quest_outcome, generate_procedural_quest, quest_summary, submit_quest_job, transition_quest
+)
 from datetime import datetime
+import orjson
 
 quest_bp = Blueprint('quest', __name__)
+quest_bp.before_request(require_bearer_token)
+
+def _job_accepted(message, job):
+    return json_response({
+        'message': message,
+        'job_id': job.id,
+        'quest_id': job.quest_id,
+        'status': job.status,
+        'status_url': url_for('quest.quest_status', job_id=job.id)
+    }, 202)
+
+@quest_bp.route('/quest_status/<job_id>', methods=['GET'])
+def quest_status(job_id):
+    """
+    Get the status and, once finished, the result of a queued quest job
+    """
+    job = db.session.get(QuestJob, job_id)
+    if not job:
+        return jsonify({'error': 'Quest job not found'}), 404
+    
+    if expire_stale_quest_job(job):
+        db.session.refresh(job)
+    
+    return json_response({
+        'job_id': job.id,
+        'kind': job.kind,
+        'quest_id': job.quest_id,
+        'status': job.status,
+        'result': job.result,
+        'error': job.error,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at
+    })
+
+def _quest_status(quest_id, user):
+    return db.session.execute(
+        select(QuestLog.status).where(QuestLog.id == quest_id, QuestLog.user == user)
+    ).scalar()
 
 @quest_bp.route('/generate_quest', methods=['POST'])
-def generate_quest():
+@json_endpoint('user')
+def generate_quest(data):
     """
     Generate procedural quest based on player state, faction relations, and Force alignment
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
     user = data.get('user')
     session_id = data.get('session_id')
     difficulty_preference = data.get('difficulty', 'medium')  # easy, medium, hard, extreme
     quest_type_preference = data.get('quest_type')  # combat, social, exploration, force, faction
     location = data.get('location')  # Current player location
     
-    if not user:
-        return jsonify({'error': 'Missing required field: user'}), 400
+    params = {
+        'session_id': session_id,
+        'difficulty_preference': difficulty_preference,
+        'quest_type_preference': quest_type_preference,
+        'location': location
+    }
     
     try:
+        if not data.get('sync', False):
+            # Generate in the background; poll the returned status_url for the quest
+            job = submit_quest_job('generate', user, **params)
+            return _job_accepted('Quest generation queued', job)
+        
         # Generate quest using procedural system
-        quest_data = generate_procedural_quest(
-            user=user,
-            session_id=session_id,
-            difficulty_preference=difficulty_preference,
-            quest_type_preference=quest_type_preference,
-            location=location
-        )
+        quest = create_procedural_quest(user, **params)
         
-        if not quest_data:
+        if not quest:
             return jsonify({'error': 'No suitable quest could be generated at this time'}), 404
         
-        # Create quest log entry
-        quest = QuestLog(
-            user=user,
-            quest_title=quest_data['title'],
-            quest_description=quest_data['description'],
-            quest_giver=quest_data['giver'],
-            reward=str(quest_data['rewards']),
-            requirements=str(quest_data['requirements']),
-            status='available',
-            difficulty=quest_data['difficulty'],
-            faction_impact=str(quest_data.get('faction_impact', {})),
-            force_impact=quest_data.get('force_impact', 0),
-            generated_reason=quest_data['generation_reason'],
-            prerequisite_events=str(quest_data.get('prerequisites', [])),
-            session_id=session_id
-        )
-        
-        db.session.add(quest)
-        db.session.commit()
-        
         return jsonify({
             'message': 'Quest generated successfully',
-            'quest': {
-                'id': quest.id,
-                'title': quest.quest_title,
-                'description': quest.quest_description,
-                'giver': quest.quest_giver,
-                'rewards': quest_data['rewards'],
-                'requirements': quest_data['requirements'],
-                'difficulty': quest.difficulty,
-                'faction_impact': quest_data.get('faction_impact', {}),
-                'force_impact': quest.force_impact,
-                'generation_reason': quest.generated_reason,
-                'status': quest.status
-            }
+            'quest': quest
         })
     
     except Exception as e:
@@ -85,34 +94,72 @@ def generate_quest():
             'details': str(e)
         }), 500
 
-@quest_bp.route('/accept_quest', methods=['POST'])
-def accept_quest():
+@quest_bp.route('/generate_quests_batch', methods=['POST'])
+@json_endpoint('user')
+def generate_quests_batch(data):
     """
-    Accept an available quest
+    Generate several procedural quests for a player in one request
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
+    user = data.get('user')
+    session_id = data.get('session_id')
+    count = data.get('count', 3)
     
-    data = request.get_json()
+    if not isinstance(count, int) or not 1 <= count <= 10:
+        return jsonify({'error': 'count must be an integer between 1 and 10'}), 400
     
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
+    try:
+        generated = [
+            generate_procedural_quest(
+                user=user,
+                session_id=session_id,
+                difficulty_preference=data.get('difficulty', 'medium'),
+                quest_type_preference=data.get('quest_type'),
+                location=data.get('location')
+            )
+            for _ in range(count)
+        ]
+        generated = [quest_data for quest_data in generated if quest_data]
+        
+        if not generated:
+            return jsonify({'error': 'No suitable quest could be generated at this time'}), 404
+        
+        # One executemany INSERT for the whole batch, ids returned in parameter order
+        rows = db.session.execute(
+            insert(QuestLog).returning(QuestLog.id, QuestLog.created_at, sort_by_parameter_order=True),
+            [build_quest_values(user, session_id, quest_data) for quest_data in generated]
+        ).all()
+        db.session.commit()
+        
+        return jsonify({
+            'message': f'Generated {len(rows)} quests',
+            'quests': [
+                quest_summary(row, quest_data)
+                for row, quest_data in zip(rows, generated)
+            ]
+        })
     
+    except Exception as e:
+        return jsonify({
+            'error': 'Failed to generate quests',
+            'details': str(e)
+        }), 500
+
+@quest_bp.route('/accept_quest', methods=['POST'])
+@json_endpoint('quest_id', 'user')
+def accept_quest(data):
+    """
+    Accept an available quest
+    """
     quest_id = data.get('quest_id')
     user = data.get('user')
     
-    if not all([quest_id, user]):
-        return jsonify({'error': 'Missing required fields: quest_id, user'}), 400
-    
-    quest = QuestLog.query.filter_by(id=quest_id, user=user).first()
+    quest, status = transition_quest(quest_id, user, ('available',), status='active')
     
     if not quest:
-        return jsonify({'error': 'Quest not found'}), 404
+        if status is None:
+            return jsonify({'error': 'Quest not found'}), 404
+        return jsonify({'error': f'Quest is not available (current status: {status})'}), 400
     
-    if quest.status != 'available':
-        return jsonify({'error': f'Quest is not available (current status: {quest.status})'}), 400
-    
-    quest.status = 'active'
     db.session.commit()
     
     return jsonify({
@@ -123,58 +170,45 @@ def accept_quest():
     })
 
 @quest_bp.route('/complete_quest', methods=['POST'])
-def complete_quest():
+@json_endpoint('quest_id', 'user')
+def complete_quest(data):
     """
     Complete an active quest and apply rewards/consequences
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
     quest_id = data.get('quest_id')
     user = data.get('user')
     completion_method = data.get('completion_method', 'standard')  # How the quest was completed
     player_choices = data.get('player_choices', [])  # Key decisions made during quest
     session_id = data.get('session_id')
     
-    if not all([quest_id, user]):
-        return jsonify({'error': 'Missing required fields: quest_id, user'}), 400
-    
-    quest = QuestLog.query.filter_by(id=quest_id, user=user).first()
-    
-    if not quest:
-        return jsonify({'error': 'Quest not found'}), 404
-    
-    if quest.status != 'active':
-        return jsonify({'error': f'Quest is not active (current status: {quest.status})'}), 400
+    params = {
+        'completion_method': completion_method,
+        'player_choices': player_choices,
+        'session_id': session_id
+    }
     
     try:
-        # Evaluate quest completion and apply consequences
-        completion_result = evaluate_quest_completion(
-            quest=quest,
-            completion_method=completion_method,
-            player_choices=player_choices,
-            session_id=session_id
-        )
+        if data.get('sync', True):
+            # Update quest status
+            quest, status = transition_quest(
+                quest_id, user, ('active',), status='completed', completed_at=datetime.utcnow()
+            )
+        else:
+            # The job completes the quest along with its rewards and consequences
+            quest, status = None, _quest_status(quest_id, user)
+            if status == 'active':
+                job = submit_quest_job('complete', user, quest_id, **params)
+                return _job_accepted('Quest completion queued', job)
         
-        # Update quest status
-        quest.status = 'completed'
-        quest.completed_at = datetime.utcnow()
-        db.session.commit()
+        if not quest:
+            if status is None:
+                return jsonify({'error': 'Quest not found'}), 404
+            return jsonify({'error': f'Quest is not active (current status: {status})'}), 400
         
+        # Evaluate quest completion and apply consequences
         return jsonify({
             'message': 'Quest completed successfully',
-            'quest_id': quest.id,
-            'title': quest.quest_title,
-            'completion_result': completion_result,
-            'rewards_granted': completion_result.get('rewards', []),
-            'faction_changes': completion_result.get('faction_changes', {}),
-            'force_alignment_change': completion_result.get('force_change', 0),
-            'consequences': completion_result.get('consequences', [])
+            **complete_quest_outcome(quest, **params)
         })
     
     except Exception as e:
@@ -184,56 +218,40 @@ def complete_quest():
         }), 500
 
 @quest_bp.route('/fail_quest', methods=['POST'])
-def fail_quest():
+@json_endpoint('quest_id', 'user')
+def fail_quest(data):
     """
     Fail an active quest with consequences
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
     quest_id = data.get('quest_id')
     user = data.get('user')
     failure_reason = data.get('failure_reason', 'unknown')
     session_id = data.get('session_id')
     
-    if not all([quest_id, user]):
-        return jsonify({'error': 'Missing required fields: quest_id, user'}), 400
-    
-    quest = QuestLog.query.filter_by(id=quest_id, user=user).first()
-    
-    if not quest:
-        return jsonify({'error': 'Quest not found'}), 404
-    
-    if quest.status not in ['active', 'available']:
-        return jsonify({'error': f'Quest cannot be failed (current status: {quest.status})'}), 400
+    params = {'failure_reason': failure_reason, 'session_id': session_id}
     
     try:
-        # Apply failure consequences
-        from services.quest_generator import apply_quest_failure_consequences
-        failure_result = apply_quest_failure_consequences(
-            quest=quest,
-            failure_reason=failure_reason,
-            session_id=session_id
-        )
+        if data.get('sync', True):
+            # Update quest status
+            quest, status = transition_quest(
+                quest_id, user, ('active', 'available'), status='failed', completed_at=datetime.utcnow()
+            )
+        else:
+            # The job fails the quest along with its consequences
+            quest, status = None, _quest_status(quest_id, user)
+            if status in ('active', 'available'):
+                job = submit_quest_job('fail', user, quest_id, **params)
+                return _job_accepted('Quest failure queued', job)
         
-        # Update quest status
-        quest.status = 'failed'
-        quest.completed_at = datetime.utcnow()
-        db.session.commit()
+        if not quest:
+            if status is None:
+                return jsonify({'error': 'Quest not found'}), 404
+            return jsonify({'error': f'Quest cannot be failed (current status: {status})'}), 400
         
+        # Apply failure consequences
         return jsonify({
             'message': 'Quest failed',
-            'quest_id': quest.id,
-            'title': quest.quest_title,
-            'failure_reason': failure_reason,
-            'consequences': failure_result.get('consequences', []),
-            'faction_changes': failure_result.get('faction_changes', {}),
-            'reputation_impact': failure_result.get('reputation_impact', 0)
+            **fail_quest_outcome(quest, **params)
         })
     
     except Exception as e:
@@ -242,43 +260,69 @@ def fail_quest():
             'details': str(e)
         }), 500
 
+def _quest_list_json(q):
+    return orjson.dumps({
+        'id': q.id,
+        'title': q.quest_title,
+        'description': q.quest_description,
+        'giver': q.quest_giver,
+        'difficulty': q.difficulty,
+        'status': q.status,
+        'force_impact': q.force_impact,
+        'created_at': q.created_at,
+        'completed_at': q.completed_at
+    })
+
 @quest_bp.route('/get_available_quests', methods=['GET'])
 def get_available_quests():
     """
     Get all available quests for a user
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
     user = request.args.get('user')
     session_id = request.args.get('session_id')
     status = request.args.get('status', 'available')  # available, active, completed, failed
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    cursor = request.args.get('cursor')
     
     if not user:
         return jsonify({'error': 'Missing required parameter: user'}), 400
     
-    query = QuestLog.query.filter_by(user=user, status=status)
+    # Select only the listed columns and stream them out as they are read
+    stmt = (
+        select(
+            QuestLog.id,
+            QuestLog.quest_title,
+            QuestLog.quest_description,
+            QuestLog.quest_giver,
+            QuestLog.difficulty,
+            QuestLog.status,
+            QuestLog.force_impact,
+            QuestLog.created_at,
+            QuestLog.completed_at
+        )
+        .filter_by(user=user, status=status)
+        .order_by(QuestLog.created_at.desc(), QuestLog.id.desc())
+        .limit(limit)
+        .execution_options(yield_per=100)
+    )
     
     if session_id:
-        query = query.filter_by(session_id=session_id)
-    
-    quests = query.order_by(QuestLog.created_at.desc()).all()
-    
-    return jsonify({
-        'quests': [
-            {
-                'id': q.id,
-                'title': q.quest_title,
-                'description': q.quest_description,
-                'giver': q.quest_giver,
-                'difficulty': q.difficulty,
-                'status': q.status,
-                'force_impact': q.force_impact,
-                'created_at': q.created_at.isoformat(),
-                'completed_at': q.completed_at.isoformat() if q.completed_at else None
-            }
-            for q in quests
-        ],
-        'total_quests': len(quests),
-        'status_filter': status
-    })
+        stmt = stmt.filter_by(session_id=session_id)
+    
+    # Keyset pagination: pass the previous page's next_cursor to get the next page
+    if cursor:
+        try:
+            stmt = stmt.where(before_keyset_cursor(cursor, QuestLog.created_at, QuestLog.id))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return stream_json_list(
+        'quests',
+        lambda: db.session.execute(stmt),
+        _quest_list_json,
+        total_key='total_quests',
+        tail=lambda count, last: {
+            'status_filter': status,
+            'next_cursor': keyset_cursor(last.created_at, last.id) if count == limit else None
+        }
+    )
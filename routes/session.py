@@ -1,60 +1,143 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from app import db
 from models import SessionState
-from routes.auth import check_bearer_auth
-from datetime import datetime
-import json
-import uuid
+from sqlalchemy import Text, case, cast, exists, func, insert, select, update
+from routes.auth import require_bearer_token
+from utils.cache import TTLCache
+from utils.db_helpers import before_keyset_cursor, keyset_cursor
+from utils.ids import uuid7
+from utils.json_helpers import json_endpoint, stream_json_list
+import orjson
 
 session_bp = Blueprint('session', __name__)
+session_bp.before_request(require_bearer_token)
 
-@session_bp.route('/create_session', methods=['POST'])
-def create_session():
+# Galaxy state for sessions created without one. It is only ever serialized,
+# into the new row and the response, so it is shared rather than copied.
+DEFAULT_GALAXY_STATE = {
+    'galactic_year': 0,  # Years since Battle of Yavin
+    'major_powers': {
+        'empire': {'control': 70, 'resources': 10000},
+        'rebellion': {'control': 15, 'resources': 2000},
+        'hutts': {'control': 10, 'resources': 5000},
+        'csa': {'control': 5, 'resources': 3000}
+    },
+    'trade_routes': ['Corellian Run', 'Hydian Way', 'Perlemian Trade Route'],
+    'active_conflicts': [],
+    'force_balance': 0  # -100 (Dark) to 100 (Light)
+}
+
+# Serialized get_session_state bodies by session_id, dropped by the session
+# write handlers. Each worker holds its own copy, so other workers may serve a
+# write up to ttl late.
+_session_states = TTLCache(maxsize=1024, ttl=5)
+
+# update_session_state body fields and the session_state columns they set
+SESSION_STATE_FIELDS = {
+    'galaxy_state': 'galaxy_state',
+    'galactic_year': 'current_galactic_year',
+    'major_events': 'major_events',
+    'faction_war_status': 'faction_war_status',
+    'force_nexus_events': 'force_nexus_events',
+    'threat_escalation_level': 'threat_escalation_level'
+}
+
+# Player list membership changes run as single UPDATE ... RETURNING statements
+# against the JSON column, so concurrent joins and leaves cannot overwrite each
+# other. A join or leave that would not change the list matches no row, so it
+# writes and commits nothing; the handler then only reads the row
+
+def _player_listed(players, player_name):
+    if db.engine.dialect.name == 'postgresql':
+        return players.op('@>', is_comparison=True)(func.jsonb_build_array(cast(player_name, Text)))
+    listed = func.json_each(players).table_valued('value')
+    return exists(select(1).select_from(listed).where(listed.c.value == player_name))
+
+def _add_active_player(session_id, player_name, *returning, skip_listed=False, **values):
     """
-    Create a new multiplayer session
+    Append player_name to a session's active players unless already listed
+    
+    Returns the row of requested columns, or None if the session does not
+    exist or, with skip_listed, the player was already listed. Without
+    skip_listed the row is always updated, so updated_at moves and any other
+    column values given are set in the same statement.
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
+    table = SessionState.__table__
+    players = table.c.active_players
+    
+    if db.engine.dialect.name == 'postgresql':
+        appended = players.op('||')(func.jsonb_build_array(cast(player_name, Text)))
+    else:
+        appended = func.json_insert(players, '$[#]', player_name)
     
-    data = request.get_json()
+    stmt = update(table).where(table.c.session_id == session_id)
+    if skip_listed:
+        stmt = stmt.where(~_player_listed(players, player_name)).values(active_players=appended, **values)
+    else:
+        stmt = stmt.values(active_players=case((_player_listed(players, player_name), players), else_=appended), **values)
     
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
+    return db.session.execute(stmt.returning(*returning or (table.c.id,))).first()
+
+def _remove_active_player(session_id, player_name, *returning):
+    """
+    Remove player_name from a session's active players
     
+    Returns the row of requested columns, or None if the session does not
+    exist or the player was not listed.
+    """
+    table = SessionState.__table__
+    players = table.c.active_players
+    
+    if db.engine.dialect.name == 'postgresql':
+        remaining = players.op('-')(cast(player_name, Text))
+    else:
+        listed = func.json_each(players).table_valued('value')
+        remaining = select(func.json_group_array(listed.c.value)).where(listed.c.value != player_name).scalar_subquery()
+    
+    return db.session.execute(
+        update(table)
+        .where(table.c.session_id == session_id, _player_listed(players, player_name))
+        .values(active_players=remaining)
+        .returning(*returning or (table.c.id,))
+    ).first()
+
+def _session_columns(*names):
+    return [SessionState.__table__.c[name] for name in names]
+
+def _read_session(session_id, columns):
+    return db.session.execute(
+        select(*columns).where(SessionState.__table__.c.session_id == session_id)
+    ).first()
+
+@session_bp.route('/create_session', methods=['POST'])
+@json_endpoint('session_name', 'created_by')
+def create_session(data):
+    """
+    Create a new multiplayer session
+    """
     session_name = data.get('session_name')
     created_by = data.get('created_by')
     initial_galaxy_state = data.get('galaxy_state', {})
     
-    if not all([session_name, created_by]):
-        return jsonify({'error': 'Missing required fields: session_name, created_by'}), 400
-    
     # Generate unique session ID
-    session_id = str(uuid.uuid4())
+    session_id = str(uuid7())
     
-    # Create default galaxy state if not provided
+    # Use the default galaxy state if not provided
     if not initial_galaxy_state:
-        initial_galaxy_state = {
-            'galactic_year': 0,  # Years since Battle of Yavin
-            'major_powers': {
-                'empire': {'control': 70, 'resources': 10000},
-                'rebellion': {'control': 15, 'resources': 2000},
-                'hutts': {'control': 10, 'resources': 5000},
-                'csa': {'control': 5, 'resources': 3000}
-            },
-            'trade_routes': ['Corellian Run', 'Hydian Way', 'Perlemian Trade Route'],
-            'active_conflicts': [],
-            'force_balance': 0  # -100 (Dark) to 100 (Light)
-        }
-    
-    session = SessionState(
+        initial_galaxy_state = DEFAULT_GALAXY_STATE
+    elif not isinstance(initial_galaxy_state, dict):
+        return jsonify({'error': 'galaxy_state must be an object'}), 400
+    
+    # Nothing reads the new row back, so insert it directly instead of
+    # tracking an ORM object; the state dict is encoded once, for the column,
+    # and the same dict is returned in the response
+    db.session.execute(insert(SessionState).values(
         session_id=session_id,
         session_name=session_name,
-        galaxy_state=json.dumps(initial_galaxy_state),
-        active_players=json.dumps([created_by]),
+        galaxy_state=initial_galaxy_state,
+        active_players=[created_by],
         current_galactic_year=initial_galaxy_state.get('galactic_year', 0)
-    )
-    
-    db.session.add(session)
+    ))
     db.session.commit()
     
     return jsonify({
@@ -70,168 +153,144 @@ def get_session_state():
     """
     Get current session state for multiplayer synchronization
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
     session_id = request.args.get('session_id')
     
     if not session_id:
         return jsonify({'error': 'Missing required parameter: session_id'}), 400
     
-    session = SessionState.query.filter_by(session_id=session_id).first()
+    # Clients poll this to stay in sync; serve repeats from the short-lived cache
+    body = _session_states.get(session_id)
+    if body is not None:
+        return Response(body, mimetype='application/json')
+    
+    session = db.session.scalar(select(SessionState).filter_by(session_id=session_id))
     
     if not session:
         return jsonify({'error': 'Session not found'}), 404
     
-    return jsonify({
+    body = orjson.dumps({
         'session_id': session.session_id,
         'session_name': session.session_name,
-        'galaxy_state': json.loads(session.galaxy_state),
-        'active_players': json.loads(session.active_players),
+        'galaxy_state': session.galaxy_state,
+        'active_players': session.active_players,
         'current_galactic_year': session.current_galactic_year,
-        'major_events': json.loads(session.major_events),
-        'faction_war_status': json.loads(session.faction_war_status),
-        'force_nexus_events': json.loads(session.force_nexus_events),
+        'major_events': session.major_events,
+        'faction_war_status': session.faction_war_status,
+        'force_nexus_events': session.force_nexus_events,
         'threat_escalation_level': session.threat_escalation_level,
-        'last_faction_tick': session.last_faction_tick.isoformat(),
-        'updated_at': session.updated_at.isoformat()
+        'last_faction_tick': session.last_faction_tick,
+        'updated_at': session.updated_at
     })
+    _session_states.set(session_id, body)
+    
+    return Response(body, mimetype='application/json')
 
 @session_bp.route('/update_session_state', methods=['POST'])
-def update_session_state():
+@json_endpoint('session_id', 'updated_by')
+def update_session_state(data):
     """
     Update session state with new galaxy changes (for multiplayer sync)
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
     session_id = data.get('session_id')
     updated_by = data.get('updated_by')
     
-    if not all([session_id, updated_by]):
-        return jsonify({'error': 'Missing required fields: session_id, updated_by'}), 400
-    
-    session = SessionState.query.filter_by(session_id=session_id).first()
-    
-    if not session:
-        return jsonify({'error': 'Session not found'}), 404
-    
     # Update galaxy state fields if provided
-    if 'galaxy_state' in data:
-        session.galaxy_state = json.dumps(data['galaxy_state'])
-    
-    if 'galactic_year' in data:
-        session.current_galactic_year = data['galactic_year']
-    
-    if 'major_events' in data:
-        session.major_events = json.dumps(data['major_events'])
-    
-    if 'faction_war_status' in data:
-        session.faction_war_status = json.dumps(data['faction_war_status'])
-    
-    if 'force_nexus_events' in data:
-        session.force_nexus_events = json.dumps(data['force_nexus_events'])
-    
-    if 'threat_escalation_level' in data:
-        session.threat_escalation_level = data['threat_escalation_level']
-    
-    # Update active players list
-    current_players = json.loads(session.active_players)
-    if updated_by not in current_players:
-        current_players.append(updated_by)
-        session.active_players = json.dumps(current_players)
-    
-    session.updated_at = datetime.utcnow()
-    db.session.commit()
+    values = {
+        column: data[field]
+        for field, column in SESSION_STATE_FIELDS.items()
+        if field in data
+    }
+    
+    # One UPDATE sets the fields, adds the player to the active players list
+    # and bumps updated_at, without loading the row first
+    columns = _session_columns('updated_at')
+    session = _add_active_player(session_id, updated_by, *columns, **values)
+    
+    if session:
+        db.session.commit()
+        _session_states.pop(session_id)
+    else:
+        session = _read_session(session_id, columns)
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
     
     return jsonify({
         'message': 'Session state updated successfully',
         'session_id': session_id,
         'updated_by': updated_by,
-        'updated_at': session.updated_at.isoformat()
+        'updated_at': session.updated_at
     })
 
 @session_bp.route('/join_session', methods=['POST'])
-def join_session():
+@json_endpoint('session_id', 'player_name')
+def join_session(data):
     """
     Join an existing multiplayer session
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
     session_id = data.get('session_id')
     player_name = data.get('player_name')
     
-    if not all([session_id, player_name]):
-        return jsonify({'error': 'Missing required fields: session_id, player_name'}), 400
-    
-    session = SessionState.query.filter_by(session_id=session_id).first()
-    
-    if not session:
-        return jsonify({'error': 'Session not found'}), 404
-    
     # Add player to active players list
-    current_players = json.loads(session.active_players)
-    if player_name not in current_players:
-        current_players.append(player_name)
-        session.active_players = json.dumps(current_players)
-        session.updated_at = datetime.utcnow()
+    columns = _session_columns('session_name', 'active_players', 'galaxy_state')
+    session = _add_active_player(session_id, player_name, *columns, skip_listed=True)
+    
+    if session:
         db.session.commit()
+        _session_states.pop(session_id)
+    else:
+        # Already listed, or no such session
+        session = _read_session(session_id, columns)
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
     
     return jsonify({
         'message': f'Successfully joined session: {session.session_name}',
         'session_id': session_id,
         'session_name': session.session_name,
-        'active_players': current_players,
-        'galaxy_state': json.loads(session.galaxy_state)
+        'active_players': session.active_players,
+        'galaxy_state': session.galaxy_state
     })
 
 @session_bp.route('/leave_session', methods=['POST'])
-def leave_session():
+@json_endpoint('session_id', 'player_name')
+def leave_session(data):
     """
     Leave a multiplayer session
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Missing request body'}), 400
-    
     session_id = data.get('session_id')
     player_name = data.get('player_name')
     
-    if not all([session_id, player_name]):
-        return jsonify({'error': 'Missing required fields: session_id, player_name'}), 400
-    
-    session = SessionState.query.filter_by(session_id=session_id).first()
-    
-    if not session:
-        return jsonify({'error': 'Session not found'}), 404
-    
     # Remove player from active players list
-    current_players = json.loads(session.active_players)
-    if player_name in current_players:
-        current_players.remove(player_name)
-        session.active_players = json.dumps(current_players)
-        session.updated_at = datetime.utcnow()
+    columns = _session_columns('session_name', 'active_players')
+    session = _remove_active_player(session_id, player_name, *columns)
+    
+    if session:
         db.session.commit()
+        _session_states.pop(session_id)
+    else:
+        # Not listed, or no such session
+        session = _read_session(session_id, columns)
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
     
     return jsonify({
         'message': f'Successfully left session: {session.session_name}',
         'session_id': session_id,
-        'remaining_players': current_players
+        'remaining_players': session.active_players
+    })
+
+def _session_summary_json(s):
+    # The JSON column is decoded once when the row is fetched; reuse that list
+    active_players = s.active_players
+    return orjson.dumps({
+        'session_id': s.session_id,
+        'session_name': s.session_name,
+        'active_players': active_players,
+        'player_count': len(active_players),
+        'galactic_year': s.current_galactic_year,
+        'threat_level': s.threat_escalation_level,
+        'created_at': s.created_at,
+        'updated_at': s.updated_at
     })
 
 @session_bp.route('/list_sessions', methods=['GET'])
@@ -239,24 +298,40 @@ def list_sessions():
     """
     List all available sessions
     """
-    if not check_bearer_auth():
-        return jsonify({'error': 'Unauthorized - Invalid Bearer token'}), 401
-    
-    sessions = SessionState.query.order_by(SessionState.updated_at.desc()).all()
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    cursor = request.args.get('cursor')
+    
+    # Select only the summary columns, streamed out as they are read; the galaxy
+    # state and event blobs stay in the database
+    stmt = (
+        select(
+            SessionState.id,
+            SessionState.session_id,
+            SessionState.session_name,
+            SessionState.active_players,
+            SessionState.current_galactic_year,
+            SessionState.threat_escalation_level,
+            SessionState.created_at,
+            SessionState.updated_at
+        )
+        .order_by(SessionState.updated_at.desc(), SessionState.id.desc())
+        .limit(limit)
+        .execution_options(yield_per=100)
+    )
     
-    return jsonify({
-        'sessions': [
-            {
-                'session_id': s.session_id,
-                'session_name': s.session_name,
-                'active_players': json.loads(s.active_players),
-                'player_count': len(json.loads(s.active_players)),
-                'galactic_year': s.current_galactic_year,
-                'threat_level': s.threat_escalation_level,
-                'created_at': s.created_at.isoformat(),
-                'updated_at': s.updated_at.isoformat()
-            }
-            for s in sessions
-        ],
-        'total_sessions': len(sessions)
-    })
+    # Keyset pagination: pass the previous page's next_cursor to get the next page
+    if cursor:
+        try:
+            stmt = stmt.where(before_keyset_cursor(cursor, SessionState.updated_at, SessionState.id))
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    return stream_json_list(
+        'sessions',
+        lambda: db.session.execute(stmt),
+        _session_summary_json,
+        total_key='total_sessions',
+        tail=lambda count, last: {
+            'next_cursor': keyset_cursor(last.updated_at, last.id) if count == limit else None
+        }
+    )
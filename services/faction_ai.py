@@ -1,9 +1,126 @@
-from app import db
-from models import FactionState, WorldEvent, SessionState
-import json
+from app import app, db, executor
+from models import FactionState, FactionTickJob, WorldEvent, SessionState, utcnow
+from sqlalchemy import bindparam, case, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from utils.ids import uuid7
+from utils.db_helpers import append_json_item, expire_stale_job
+from dataclasses import dataclass
+import logging
 import random
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
+# Minimum time between autonomous turns for a faction
+FACTION_TICK_INTERVAL = timedelta(hours=24)
+
+# Queued ticks run on an in-process executor and die with their worker; one
+# still queued or running after this long is reported as failed
+FACTION_TICK_JOB_TIMEOUT = timedelta(minutes=10)
+
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# Operation templates per faction type and strategic goal
+OPERATION_TEMPLATES = {
+    'Imperial': {
+        'Maintain Order': (
+            {'name': 'System Patrol', 'duration_days': 7, 'resource_cost': 200, 'success_chance': 0.8},
+            {'name': 'Rebel Hunt', 'duration_days': 14, 'resource_cost': 500, 'success_chance': 0.6}
+        ),
+        'Expand Territory': (
+            {'name': 'System Annexation', 'duration_days': 30, 'resource_cost': 1000, 'territory_gain': 1},
+            {'name': 'Diplomatic Pressure', 'duration_days': 21, 'resource_cost': 300, 'influence_gain': 5}
+        )
+    },
+    'Rebel': {
+        'Liberate Systems': (
+            {'name': 'Liberation Campaign', 'duration_days': 21, 'resource_cost': 800, 'territory_gain': 1},
+            {'name': 'Propaganda Operations', 'duration_days': 14, 'resource_cost': 200, 'influence_gain': 3}
+        ),
+        'Sabotage Empire': (
+            {'name': 'Supply Line Disruption', 'duration_days': 7, 'resource_cost': 150, 'success_chance': 0.7},
+            {'name': 'Intelligence Gathering', 'duration_days': 10, 'resource_cost': 100, 'success_chance': 0.8}
+        )
+    },
+    'Criminal': {
+        'Control Trade Routes': (
+            {'name': 'Route Enforcement', 'duration_days': 14, 'resource_cost': 300, 'resource_gain': 500},
+            {'name': 'Competitor Elimination', 'duration_days': 7, 'resource_cost': 200, 'success_chance': 0.6}
+        ),
+        'Expand Criminal Empire': (
+            {'name': 'Territory Expansion', 'duration_days': 21, 'resource_cost': 400, 'territory_gain': 1},
+            {'name': 'Corruption Network', 'duration_days': 14, 'resource_cost': 250, 'influence_gain': 2}
+        )
+    },
+    'Corporate': {
+        'Maximize Profits': (
+            {'name': 'Market Expansion', 'duration_days': 30, 'resource_cost': 500, 'resource_gain': 800},
+            {'name': 'Efficiency Optimization', 'duration_days': 14, 'resource_cost': 200, 'resource_gain': 300}
+        ),
+        'Develop Technology': (
+            {'name': 'R&D Investment', 'duration_days': 45, 'resource_cost': 1000, 'influence_gain': 5},
+            {'name': 'Patent Acquisition', 'duration_days': 7, 'resource_cost': 300, 'success_chance': 0.8}
+        )
+    }
+}
+
+# Hostile faction pairs and their base conflict chance
+HOSTILE_RELATIONSHIPS = (
+    ('Galactic Empire', 'Rebel Alliance', 0.8),
+    ('Hutt Cartel', 'Corporate Sector Authority', 0.3),
+    ('Galactic Empire', 'Hutt Cartel', 0.2)
+)
+
+# Event headlines per faction type; {name} is the faction name
+FACTION_EVENT_TITLES = {
+    'Imperial': (
+        "{name} Consolidates Power",
+        "Imperial Forces Expand Operations",
+        "{name} Demonstrates Military Might"
+    ),
+    'Rebel': (
+        "{name} Strikes Back",
+        "Rebellion Gains Momentum",
+        "{name} Liberates Systems"
+    ),
+    'Criminal': (
+        "{name} Expands Territory",
+        "Criminal Empire Grows Stronger",
+        "{name} Consolidates Control"
+    ),
+    'Corporate': (
+        "{name} Reports Record Profits",
+        "Corporate Expansion Continues",
+        "{name} Announces New Ventures"
+    )
+}
+
+# Columns a faction turn reads; the tick works on plain rows rather than ORM objects
+_faction_table = FactionState.__table__
+_TURN_COLUMNS = (
+    _faction_table.c.id, _faction_table.c.faction_name, _faction_table.c.faction_type,
+    _faction_table.c.resources, _faction_table.c.influence, _faction_table.c.territory_control,
+    _faction_table.c.active_operations, _faction_table.c.strategic_goals
+)
+
+@dataclass(slots=True)
+class FactionTurn:
+    """
+    Mutable copy of the faction columns one tick reads and writes
+    
+    Has the same attribute names as FactionState so the strategy code can
+    run without instantiating ORM objects.
+    """
+    id: int
+    faction_name: str
+    faction_type: str
+    resources: int
+    influence: int
+    territory_control: int
+    active_operations: list
+    strategic_goals: list
+
 def initialize_default_factions():
     """
     Initialize default Star Wars factions if they don't exist
@@ -43,18 +160,33 @@ def initialize_default_factions():
         }
     ]
     
-    for faction_data in default_factions:
-        existing_faction = FactionState.query.filter_by(faction_name=faction_data['name']).first()
-        if not existing_faction:
-            faction = FactionState(
-                faction_name=faction_data['name'],
-                faction_type=faction_data['type'],
-                territory_control=faction_data['territory'],
-                resources=faction_data['resources'],
-                influence=faction_data['influence'],
-                strategic_goals=json.dumps(faction_data['goals'])
-            )
-            db.session.add(faction)
+    new_factions = [
+        {
+            'faction_name': faction_data['name'],
+            'faction_type': faction_data['type'],
+            'territory_control': faction_data['territory'],
+            'resources': faction_data['resources'],
+            'influence': faction_data['influence'],
+            'strategic_goals': faction_data['goals']
+        }
+        for faction_data in default_factions
+    ]
+    
+    dialect_insert = _UPSERT_INSERTS.get(db.engine.dialect.name)
+    if dialect_insert is not None:
+        # One statement; the unique faction_name makes concurrent bootstraps safe
+        db.session.execute(
+            dialect_insert(FactionState)
+            .values(new_factions)
+            .on_conflict_do_nothing(index_elements=['faction_name'])
+        )
+    else:
+        # One query for the existing names and one multi-row insert for the rest
+        existing_names = set(db.session.scalars(select(FactionState.faction_name)))
+        new_factions = [values for values in new_factions if values['faction_name'] not in existing_names]
+        
+        if new_factions:
+            db.session.execute(insert(FactionState), new_factions)
     
     db.session.commit()
 
@@ -63,51 +195,126 @@ def run_faction_tick(session_id=None, force_tick=False):
     Execute autonomous faction AI turns - the core of the persistent world simulation
     """
     results = []
+    tick_time = datetime.utcnow()
+    
+    # Load only the factions due to act (daily ticks unless forced)
+    query = select(*_TURN_COLUMNS)
+    if not force_tick:
+        query = query.where(_faction_table.c.last_action <= tick_time - FACTION_TICK_INTERVAL)
     
-    # Get all factions
-    factions = FactionState.query.all()
+    factions = [FactionTurn(*row) for row in db.session.execute(query)]
+    
+    # Nothing is due: skip the conflict rolls too, so frequent scheduled ticks stay daily
+    if not factions and not force_tick:
+        return results
     
     for faction in factions:
-        # Check if faction needs to take action (daily ticks unless forced)
-        time_since_action = datetime.utcnow() - faction.last_action
-        if not force_tick and time_since_action < timedelta(hours=24):
-            continue
-        
         # Execute faction AI logic
-        faction_result = execute_faction_strategy(faction, session_id)
+        faction_result = execute_faction_strategy(faction, session_id, tick_time)
         results.append(faction_result)
-        
-        # Update last action time
-        faction.last_action = datetime.utcnow()
-        db.session.commit()
+    
+    # Write every faction's new state, and its last action time, in one executemany UPDATE
+    if factions:
+        db.session.execute(
+            update(_faction_table)
+            .where(_faction_table.c.id == bindparam('b_id'))
+            .values(
+                resources=bindparam('b_resources'),
+                influence=bindparam('b_influence'),
+                territory_control=bindparam('b_territory_control'),
+                active_operations=bindparam('b_active_operations'),
+                last_action=tick_time
+            ),
+            [
+                {
+                    'b_id': faction.id,
+                    'b_resources': faction.resources,
+                    'b_influence': faction.influence,
+                    'b_territory_control': faction.territory_control,
+                    'b_active_operations': faction.active_operations
+                }
+                for faction in factions
+            ]
+        )
     
     # Apply inter-faction conflicts and interactions
-    conflict_results = resolve_faction_conflicts(factions, session_id)
+    conflict_results = resolve_faction_conflicts(session_id)
     results.extend(conflict_results)
     
+    # Every event of the tick goes out in one batched INSERT; read the ids before the commit expires them
+    db.session.flush()
+    for result in results:
+        if 'events_generated' in result:
+            result['events_generated'] = [
+                {'event_id': event.id, 'title': event.event_title, 'description': event.event_description}
+                for event in result['events_generated']
+            ]
+    
+    # The whole tick is one unit of work: faction updates, conflicts and events land in a single commit
+    db.session.commit()
+    
     return results
 
-def execute_faction_strategy(faction, session_id):
+def submit_faction_tick(session_id=None, force_tick=False):
+    """
+    Queue run_faction_tick on the background executor and return its job row
+    """
+    job = FactionTickJob(id=uuid7().hex, session_id=session_id, force_tick=force_tick, status='queued')
+    db.session.add(job)
+    db.session.commit()
+    
+    # The worker looks the job up by id, so it must be committed before submitting
+    executor.submit(_run_faction_tick_job, job.id, session_id, force_tick)
+    return job
+
+def _run_faction_tick_job(job_id, session_id, force_tick):
+    """
+    Run a queued faction tick with its own app context and record the outcome on the job row
+    """
+    with app.app_context():
+        db.session.execute(update(FactionTickJob).filter_by(id=job_id).values(status='running'))
+        db.session.commit()
+        
+        try:
+            outcome = {'status': 'finished', 'results': run_faction_tick(session_id, force_tick)}
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Background faction tick %s failed", job_id)
+            outcome = {'status': 'failed', 'error': str(e)}
+        
+        db.session.execute(
+            update(FactionTickJob).filter_by(id=job_id).values(finished_at=utcnow(), **outcome)
+        )
+        db.session.commit()
+
+def expire_stale_faction_tick(job):
+    """
+    Mark a faction tick job failed once it has been queued or running past FACTION_TICK_JOB_TIMEOUT
+    """
+    return expire_stale_job(db.session, job, FACTION_TICK_JOB_TIMEOUT, 'Faction tick did not finish before its worker stopped')
+
+def execute_faction_strategy(faction, session_id, tick_time):
     """
-    Execute strategic AI for a single faction
+    Execute strategic AI for a single faction at the tick's tick_time
     """
-    goals = faction.get_goals()
-    current_operations = faction.get_operations()
+    goals = faction.strategic_goals or []
+    current_operations = faction.active_operations or []
     
     # Faction AI decision making based on type and current state
     new_operations = []
     completed_operations = []
     
-    # Remove completed operations
+    # Remove completed operations; ISO timestamps compare in time order as strings
+    now = tick_time.isoformat()
     for operation in current_operations:
-        if operation.get('completion_date', datetime.utcnow().isoformat()) <= datetime.utcnow().isoformat():
+        if operation.get('completion_date', now) <= now:
             completed_operations.append(operation)
         else:
             new_operations.append(operation)
     
     # Generate new operations based on faction goals and current state
     for goal in goals[:2]:  # Focus on top 2 priorities
-        operation = generate_faction_operation(faction, goal, session_id)
+        operation = generate_faction_operation(faction, goal, session_id, tick_time)
         if operation:
             new_operations.append(operation)
     
@@ -132,7 +339,7 @@ def execute_faction_strategy(faction, session_id):
     faction.influence = max(0, min(100, faction.influence + influence_change))
     
     # Update operations
-    faction.set_operations(new_operations[:5])  # Limit to 5 active operations
+    faction.active_operations = new_operations[:5]  # Limit to 5 active operations
     
     # Generate faction events if significant changes occurred
     events = []
@@ -141,8 +348,6 @@ def execute_faction_strategy(faction, session_id):
         if event:
             events.append(event)
     
-    db.session.commit()
-    
     return {
         'faction': faction.faction_name,
         'completed_operations': completed_operations,
@@ -153,66 +358,18 @@ def execute_faction_strategy(faction, session_id):
         'events_generated': events
     }
 
-def generate_faction_operation(faction, goal, session_id):
+def generate_faction_operation(faction, goal, session_id, tick_time):
     """
-    Generate specific operations based on faction type and goals
+    Generate specific operations based on faction type and goals, starting at tick_time
     """
-    operation_templates = {
-        'Imperial': {
-            'Maintain Order': [
-                {'name': 'System Patrol', 'duration_days': 7, 'resource_cost': 200, 'success_chance': 0.8},
-                {'name': 'Rebel Hunt', 'duration_days': 14, 'resource_cost': 500, 'success_chance': 0.6}
-            ],
-            'Expand Territory': [
-                {'name': 'System Annexation', 'duration_days': 30, 'resource_cost': 1000, 'territory_gain': 1},
-                {'name': 'Diplomatic Pressure', 'duration_days': 21, 'resource_cost': 300, 'influence_gain': 5}
-            ]
-        },
-        'Rebel': {
-            'Liberate Systems': [
-                {'name': 'Liberation Campaign', 'duration_days': 21, 'resource_cost': 800, 'territory_gain': 1},
-                {'name': 'Propaganda Operations', 'duration_days': 14, 'resource_cost': 200, 'influence_gain': 3}
-            ],
-            'Sabotage Empire': [
-                {'name': 'Supply Line Disruption', 'duration_days': 7, 'resource_cost': 150, 'success_chance': 0.7},
-                {'name': 'Intelligence Gathering', 'duration_days': 10, 'resource_cost': 100, 'success_chance': 0.8}
-            ]
-        },
-        'Criminal': {
-            'Control Trade Routes': [
-                {'name': 'Route Enforcement', 'duration_days': 14, 'resource_cost': 300, 'resource_gain': 500},
-                {'name': 'Competitor Elimination', 'duration_days': 7, 'resource_cost': 200, 'success_chance': 0.6}
-            ],
-            'Expand Criminal Empire': [
-                {'name': 'Territory Expansion', 'duration_days': 21, 'resource_cost': 400, 'territory_gain': 1},
-                {'name': 'Corruption Network', 'duration_days': 14, 'resource_cost': 250, 'influence_gain': 2}
-            ]
-        },
-        'Corporate': {
-            'Maximize Profits': [
-                {'name': 'Market Expansion', 'duration_days': 30, 'resource_cost': 500, 'resource_gain': 800},
-                {'name': 'Efficiency Optimization', 'duration_days': 14, 'resource_cost': 200, 'resource_gain': 300}
-            ],
-            'Develop Technology': [
-                {'name': 'R&D Investment', 'duration_days': 45, 'resource_cost': 1000, 'influence_gain': 5},
-                {'name': 'Patent Acquisition', 'duration_days': 7, 'resource_cost': 300, 'success_chance': 0.8}
-            ]
-        }
-    }
-    
-    faction_type = faction.faction_type
-    if faction_type not in operation_templates:
+    templates = OPERATION_TEMPLATES.get(faction.faction_type, {}).get(goal)
+    if not templates:
         return None
     
-    type_operations = operation_templates[faction_type]
-    if goal not in type_operations:
-        return None
-    
-    templates = type_operations[goal]
     template = random.choice(templates)
     
     # Create operation with completion date
-    completion_date = datetime.utcnow() + timedelta(days=template.get('duration_days', 7))
+    completion_date = tick_time + timedelta(days=template.get('duration_days', 7))
     
     operation = {
         'name': template['name'],
@@ -223,7 +380,7 @@ def generate_faction_operation(faction, goal, session_id):
         'influence_gain': template.get('influence_gain', 0),
         'success_chance': template.get('success_chance', 0.7),
         'completion_date': completion_date.isoformat(),
-        'started_date': datetime.utcnow().isoformat()
+        'started_date': tick_time.isoformat()
     }
     
     # Check if faction has resources for operation
@@ -233,27 +390,40 @@ def generate_faction_operation(faction, goal, session_id):
     
     return None
 
-def resolve_faction_conflicts(factions, session_id):
+def resolve_faction_conflicts(session_id):
     """
     Resolve conflicts and interactions between factions
+    
+    The conflicts are rolled first and only the factions they involve are
+    loaded, so a tick without conflicts reads no further rows.
     """
     conflicts = []
     
-    # Define faction relationships and conflict probabilities
-    hostile_relationships = [
-        ('Galactic Empire', 'Rebel Alliance', 0.8),
-        ('Hutt Cartel', 'Corporate Sector Authority', 0.3),
-        ('Galactic Empire', 'Hutt Cartel', 0.2)
+    # 10% of base chance per tick
+    triggered = [
+        (faction1_name, faction2_name)
+        for faction1_name, faction2_name, conflict_chance in HOSTILE_RELATIONSHIPS
+        if random.random() < conflict_chance * 0.1
     ]
+    if not triggered:
+        return conflicts
+    
+    # Loaded after the tick's UPDATE, so these see this turn's changes
+    names = {name for pair in triggered for name in pair}
+    # No autoflush, so the tick's pending events are still inserted together
+    with db.session.no_autoflush:
+        factions_by_name = {
+            faction.faction_name: faction
+            for faction in db.session.scalars(select(FactionState).where(FactionState.faction_name.in_(names)))
+        }
     
-    for faction1_name, faction2_name, conflict_chance in hostile_relationships:
-        if random.random() < conflict_chance * 0.1:  # 10% of base chance per tick
-            faction1 = next((f for f in factions if f.faction_name == faction1_name), None)
-            faction2 = next((f for f in factions if f.faction_name == faction2_name), None)
-            
-            if faction1 and faction2:
-                conflict_result = resolve_conflict(faction1, faction2, session_id)
-                conflicts.append(conflict_result)
+    for faction1_name, faction2_name in triggered:
+        faction1 = factions_by_name.get(faction1_name)
+        faction2 = factions_by_name.get(faction2_name)
+        
+        if faction1 and faction2:
+            conflict_result = resolve_conflict(faction1, faction2, session_id)
+            conflicts.append(conflict_result)
     
     return conflicts
 
@@ -297,14 +467,12 @@ def resolve_conflict(faction1, faction2, session_id):
             event_title=f"{winner.faction_name} Gains Ground Against {loser.faction_name}",
             event_description=f"In a recent conflict, {winner.faction_name} has successfully gained {resource_transfer} resources and {territory_transfer} systems from {loser.faction_name}.",
             event_type='military',
-            affected_factions=json.dumps([winner.faction_name, loser.faction_name]),
+            affected_factions=[winner.faction_name, loser.faction_name],
             galactic_impact=int(victory_margin * 5),
             session_id=session_id
         )
         db.session.add(event)
     
-    db.session.commit()
-    
     return {
         'conflict_type': 'territorial_dispute',
         'winner': winner.faction_name,
@@ -320,18 +488,36 @@ def get_faction_state(faction_name, session_id=None):
     """
     return FactionState.query.filter_by(faction_name=faction_name).first()
 
+def _clamp(value, low, high):
+    return case((value < low, low), (value > high, high), else_=value)
+
+def _append_operation(faction_id, operation):
+    """
+    Append an operation to a faction's active operations in one UPDATE
+    """
+    appended = append_json_item(db.engine, _faction_table.c.active_operations, operation)
+    db.session.execute(update(_faction_table).where(_faction_table.c.id == faction_id).values(active_operations=appended))
+
 def update_faction_awareness(faction_name, user, relationship_change=0, awareness_change=0, action_description='', session_id=None):
     """
     Update faction awareness and relationship with player
+    
+    Both levels are adjusted and clamped by a single UPDATE ... RETURNING, so
+    no SELECT is needed and concurrent updates for one faction add up instead
+    of overwriting each other.
     """
-    faction = get_faction_state(faction_name, session_id)
+    faction = db.session.execute(
+        update(_faction_table)
+        .where(_faction_table.c.faction_name == faction_name)
+        .values(
+            awareness_level=_clamp(_faction_table.c.awareness_level + awareness_change, 0, 100),
+            hostility_level=_clamp(_faction_table.c.hostility_level + relationship_change, -100, 100)
+        )
+        .returning(_faction_table.c.id, _faction_table.c.awareness_level, _faction_table.c.hostility_level)
+    ).first()
     if not faction:
         return {'error': 'Faction not found'}
     
-    # Update awareness and hostility
-    faction.awareness_level = min(100, max(0, faction.awareness_level + awareness_change))
-    faction.hostility_level = min(100, max(-100, faction.hostility_level + relationship_change))
-    
     consequences = []
     
     # Trigger faction responses based on awareness/hostility levels
@@ -340,16 +526,15 @@ def update_faction_awareness(faction_name, user, relationship_change=0, awarenes
         consequences.append(f"{faction_name} has marked you as a priority target")
         
         # Add bounty or pursuit operation
-        operations = faction.get_operations()
+        now = datetime.utcnow()
         pursuit_op = {
             'name': f'Pursue {user}',
             'target': user,
             'resource_cost': 200,
-            'completion_date': (datetime.utcnow() + timedelta(days=7)).isoformat(),
-            'started_date': datetime.utcnow().isoformat()
+            'completion_date': (now + timedelta(days=7)).isoformat(),
+            'started_date': now.isoformat()
         }
-        operations.append(pursuit_op)
-        faction.set_operations(operations)
+        _append_operation(faction.id, pursuit_op)
     
     elif faction.awareness_level > 75:
         consequences.append(f"{faction_name} intelligence networks are actively tracking your movements")
@@ -365,67 +550,56 @@ def update_faction_awareness(faction_name, user, relationship_change=0, awarenes
 def apply_event_to_factions(event):
     """
     Apply world event effects to relevant factions
+    
+    All affected factions are updated by one UPDATE, clamped in SQL, and the
+    transaction (including an event still pending in the session) is committed.
     """
-    affected_factions = json.loads(event.affected_factions) if isinstance(event.affected_factions, str) else event.affected_factions
-    effects = []
-    
-    for faction_name in affected_factions:
-        faction = get_faction_state(faction_name)
-        if faction:
-            # Apply event effects based on event type and impact
-            if event.event_type == 'military':
-                faction.resources -= event.galactic_impact * 50
-                faction.influence -= event.galactic_impact
-            elif event.event_type == 'economic':
-                faction.resources += event.galactic_impact * 100
-            elif event.event_type == 'political':
-                faction.influence += event.galactic_impact * 2
-            
-            # Ensure minimums
-            faction.resources = max(100, faction.resources)
-            faction.influence = max(0, min(100, faction.influence))
-            
-            effects.append({
-                'faction': faction_name,
-                'resource_change': event.galactic_impact * (-50 if event.event_type == 'military' else 100 if event.event_type == 'economic' else 0),
-                'influence_change': event.galactic_impact * (-1 if event.event_type == 'military' else 2 if event.event_type == 'political' else 0)
-            })
+    affected_factions = list(dict.fromkeys(event.affected_factions or []))
+    
+    # Event effects based on event type and impact
+    resource_change = event.galactic_impact * (-50 if event.event_type == 'military' else 100 if event.event_type == 'economic' else 0)
+    influence_change = event.galactic_impact * (-1 if event.event_type == 'military' else 2 if event.event_type == 'political' else 0)
+    
+    updated = set()
+    if affected_factions:
+        resources = FactionState.resources + resource_change
+        influence = FactionState.influence + influence_change
+        
+        # Ensure minimums
+        updated = set(db.session.scalars(
+            update(FactionState)
+            .where(FactionState.faction_name.in_(affected_factions))
+            .values(
+                resources=case((resources < 100, 100), else_=resources),
+                influence=case((influence < 0, 0), (influence > 100, 100), else_=influence)
+            )
+            .returning(FactionState.faction_name)
+        ))
     
     db.session.commit()
-    return effects
+    
+    return [
+        {
+            'faction': faction_name,
+            'resource_change': resource_change,
+            'influence_change': influence_change
+        }
+        for faction_name in affected_factions
+        if faction_name in updated
+    ]
 
 def create_faction_event(faction, resource_change, territory_change, session_id):
     """
     Create a world event based on faction activities
+    
+    The event is only added to the session; run_faction_tick inserts all of
+    a tick's events in one flush and reports them with their ids.
     """
     if abs(resource_change) < 200 and abs(territory_change) < 1:
         return None
     
-    event_titles = {
-        'Imperial': [
-            f"{faction.faction_name} Consolidates Power",
-            f"Imperial Forces Expand Operations",
-            f"{faction.faction_name} Demonstrates Military Might"
-        ],
-        'Rebel': [
-            f"{faction.faction_name} Strikes Back",
-            f"Rebellion Gains Momentum",
-            f"{faction.faction_name} Liberates Systems"
-        ],
-        'Criminal': [
-            f"{faction.faction_name} Expands Territory",
-            f"Criminal Empire Grows Stronger",
-            f"{faction.faction_name} Consolidates Control"
-        ],
-        'Corporate': [
-            f"{faction.faction_name} Reports Record Profits",
-            f"Corporate Expansion Continues",
-            f"{faction.faction_name} Announces New Ventures"
-        ]
-    }
-    
-    titles = event_titles.get(faction.faction_type, [f"{faction.faction_name} Activities"])
-    title = random.choice(titles)
+    titles = FACTION_EVENT_TITLES.get(faction.faction_type, ("{name} Activities",))
+    title = random.choice(titles).format(name=faction.faction_name)
     
     description = f"{faction.faction_name} has been actively expanding their operations. "
     if resource_change > 0:
@@ -437,16 +611,10 @@ def create_faction_event(faction, resource_change, territory_change, session_id)
         event_title=title,
         event_description=description,
         event_type='political',
-        affected_factions=json.dumps([faction.faction_name]),
+        affected_factions=[faction.faction_name],
         galactic_impact=max(1, (abs(resource_change) // 200) + abs(territory_change)),
         session_id=session_id
     )
     
     db.session.add(event)
-    db.session.commit()
-    
-    return {
-        'event_id': event.id,
-        'title': title,
-        'description': description
-    }
+    return event
@@ -1,9 +1,83 @@
 from app import db
 from models import ForceAlignment, WorldEvent, NPCMemory, SessionState
-import json
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.sql import ClauseElement
+from utils.db_helpers import append_json_item
 import random
+from itertools import accumulate
 from datetime import datetime, timedelta
 
+# Personality traits that side an NPC with the Light or the Dark
+LIGHT_SIDE_TRAITS = frozenset(['jedi', 'light_side'])
+DARK_SIDE_TRAITS = frozenset(['sith', 'dark_side'])
+
+# Force power requirements, in the order powers are listed and unlocked; the
+# alignment requirement is a Light Side minimum, a Dark Side maximum or 'balanced'
+FORCE_POWER_REQUIREMENTS = {
+    'Force Sense': {'exp': 10, 'alignment': None},
+    'Force Push': {'exp': 25, 'alignment': None},
+    'Force Heal': {'exp': 40, 'alignment': 25},
+    'Battle Meditation': {'exp': 80, 'alignment': 60},
+    'Force Choke': {'exp': 30, 'alignment': -25},
+    'Force Lightning': {'exp': 100, 'alignment': -60},
+    'Force Stealth': {'exp': 50, 'alignment': 'balanced'}
+}
+
+# The same requirements in ascending order of experience, for scans that can
+# stop at the first power out of reach
+FORCE_POWERS_BY_EXPERIENCE = tuple(sorted(FORCE_POWER_REQUIREMENTS.items(), key=lambda item: item[1]['exp']))
+
+def _vision_table(weights):
+    """Split vision type weights into population and cumulative weights for random.choices"""
+    return tuple(weights), tuple(accumulate(weights.values()))
+
+# Vision type odds for strongly Light, strongly Dark and balanced visionaries
+LIGHT_SIDE_VISION_TYPES = _vision_table({'future_conflict': 20, 'past_echo': 30, 'personal_destiny': 30, 'galactic_consequence': 20})
+DARK_SIDE_VISION_TYPES = _vision_table({'future_conflict': 35, 'force_nexus': 25, 'personal_destiny': 25, 'galactic_consequence': 15})
+BALANCED_VISION_TYPES = _vision_table({'past_echo': 20, 'force_nexus': 30, 'personal_destiny': 25, 'galactic_consequence': 25})
+
+CONFLICT_VISIONS = (
+    "You see flashes of starships engaged in fierce battle, the outcome uncertain.",
+    "A vision of worlds in flames, empires rising and falling in the galactic dance.",
+    "You witness a confrontation between Force users, lightsabers clashing in darkness."
+)
+
+PAST_ECHO_VISIONS = (
+    "Ancient Jedi walk the halls of a temple long since fallen to ruin.",
+    "You feel the echo of a great betrayal, Jedi turning against their masters.",
+    "Sith Lords of old whisper secrets of power and domination."
+)
+
+NEXUS_VISIONS = (
+    "A hidden temple calls to you, its location just beyond clear memory.",
+    "You sense a disturbance in the Force, centered on a place of great power.",
+    "Dark energies swirl around an ancient stronghold, begging investigation."
+)
+
+LIGHT_SIDE_DESTINY_VISIONS = (
+    "You see yourself standing as a beacon of hope in dark times.",
+    "A vision of you training others in the ways of the Light.",
+    "You witness yourself making a choice that saves countless lives."
+)
+
+DARK_SIDE_DESTINY_VISIONS = (
+    "You see yourself wielding power over others, bending them to your will.",
+    "A vision of conquest, systems falling before your might.",
+    "You witness yourself standing triumphant over fallen enemies."
+)
+
+BALANCED_DESTINY_VISIONS = (
+    "You see yourself walking a path between light and darkness.",
+    "A vision of you making choices that will define your legacy.",
+    "You witness yourself bringing balance to a divided galaxy."
+)
+
+CONSEQUENCE_VISIONS = (
+    "You see the ripple effects of your actions spreading across star systems.",
+    "A vision of how your choices shape the fate of countless beings.",
+    "You witness the long-term consequences of decisions yet to be made."
+)
+
 def update_force_alignment(user, action_type, action_description='', force_magnitude=1, witnesses=[], session_id=None):
     """
     Update player Force alignment with cascading consequences following the Final Rule
@@ -17,6 +91,16 @@ def update_force_alignment(user, action_type, action_description='', force_magni
         )
         db.session.add(alignment)
     
+    result = _apply_alignment_change(alignment, action_type, action_description, force_magnitude, witnesses, session_id)
+    db.session.commit()
+    return result
+
+def _apply_alignment_change(alignment, action_type, action_description, force_magnitude, witnesses, session_id):
+    """
+    Apply a Force action to an alignment already in the session; the caller commits
+    """
+    now = datetime.utcnow()
+    
     # Calculate alignment change based on action and magnitude
     alignment_change = 0
     if action_type == 'light':
@@ -27,26 +111,21 @@ def update_force_alignment(user, action_type, action_description='', force_magni
         alignment.dark_side_points += abs(alignment_change)
     
     # Record Force event
-    force_events = json.loads(alignment.force_events) if alignment.force_events else []
     force_event = {
-        'timestamp': datetime.utcnow().isoformat(),
+        'timestamp': now.isoformat(),
         'action_type': action_type,
         'description': action_description,
         'magnitude': force_magnitude,
         'alignment_change': alignment_change,
         'witnesses': witnesses
     }
-    force_events.append(force_event)
-    alignment.force_events = json.dumps(force_events[-50:])  # Keep last 50 events
     
     # Update alignment history
-    alignment_history = json.loads(alignment.alignment_history) if alignment.alignment_history else []
-    alignment_history.append({
-        'timestamp': datetime.utcnow().isoformat(),
+    history_entry = {
+        'timestamp': force_event['timestamp'],
         'net_alignment': alignment.net_alignment,
         'change': alignment_change
-    })
-    alignment.alignment_history = json.dumps(alignment_history[-100:])  # Keep last 100 changes
+    }
     
     # Update corruption level for Dark Side users
     if alignment.net_alignment < -50:
@@ -56,7 +135,7 @@ def update_force_alignment(user, action_type, action_description='', force_magni
         # Light Side can reduce corruption
         alignment.corruption_level = max(0, alignment.corruption_level - 1)
     
-    alignment.last_force_event = datetime.utcnow()
+    alignment.last_force_event = now
     
     # Check for Force sensitivity awakening
     total_force_points = alignment.light_side_points + alignment.dark_side_points
@@ -64,17 +143,18 @@ def update_force_alignment(user, action_type, action_description='', force_magni
         alignment.force_sensitive = True
         force_event['awakening'] = True
     
+    append_history(alignment, 'force_events', force_event, 50)  # Keep last 50 events
+    append_history(alignment, 'alignment_history', history_entry, 100)  # Keep last 100 changes
+    
     # Generate cascading consequences
     consequences = trigger_force_consequences(alignment, action_type, force_magnitude, witnesses, session_id)
     
     # Update NPC reactions to Force events
-    npc_reactions = update_npc_force_reactions(user, alignment, action_type, witnesses, session_id)
+    npc_reactions = update_npc_force_reactions(alignment.user, alignment, action_type, witnesses, session_id)
     
     # Unlock new Force powers based on alignment
     unlocked_powers = check_force_power_unlocks(alignment)
     
-    db.session.commit()
-    
     return {
         'alignment_change': alignment_change,
         'new_alignment': alignment.net_alignment,
@@ -177,54 +257,85 @@ def trigger_environmental_response(user, response_type, session_id):
 def update_npc_force_reactions(user, alignment, action_type, witnesses, session_id):
     """
     Update NPC reactions based on Force events - reactive NPC system
+    
+    Reads only the columns the reactions use and writes every NPC back with
+    one executemany UPDATE; the caller commits.
     """
     reactions = []
+    table = NPCMemory.__table__
     
     # Update all NPCs that have interacted with the player
-    npcs = NPCMemory.query.filter_by(user=user).all()
+    npcs = db.session.execute(
+        select(
+            table.c.id, table.c.npc_name, table.c.personality_traits, table.c.fear_level, table.c.relationship_level, table.c.trust_level
+        ).where(table.c.user == user)
+    ).all()
+    
+    # Every NPC records the same Force event
+    now = datetime.utcnow()
+    witnessed = {
+        'timestamp': now.isoformat(),
+        'type': 'force_event_witnessed',
+        'action_type': action_type,
+        'alignment_change': alignment.net_alignment
+    }
     
+    updates = []
     for npc in npcs:
-        personality = json.loads(npc.personality_traits) if npc.personality_traits else []
+        personality = frozenset(npc.personality_traits or ())
+        light_side = not personality.isdisjoint(LIGHT_SIDE_TRAITS)
+        dark_side = not personality.isdisjoint(DARK_SIDE_TRAITS)
+        fear_level, relationship_level, trust_level = npc.fear_level, npc.relationship_level, npc.trust_level
         
         # Force-sensitive NPCs react more strongly
         if 'force_sensitive' in personality:
             if action_type == 'dark':
-                if 'jedi' in personality or 'light_side' in personality:
-                    npc.fear_level = min(100, npc.fear_level + 20)
-                    npc.relationship_level = max(-100, npc.relationship_level - 15)
+                if light_side:
+                    fear_level = min(100, fear_level + 20)
+                    relationship_level = max(-100, relationship_level - 15)
                     reactions.append(f"{npc.npc_name} senses the darkness growing within you")
-                elif 'sith' in personality or 'dark_side' in personality:
-                    npc.relationship_level = min(100, npc.relationship_level + 10)
+                elif dark_side:
+                    relationship_level = min(100, relationship_level + 10)
                     reactions.append(f"{npc.npc_name} approves of your embrace of power")
             
             elif action_type == 'light':
-                if 'jedi' in personality or 'light_side' in personality:
-                    npc.relationship_level = min(100, npc.relationship_level + 10)
-                    npc.trust_level = min(100, npc.trust_level + 5)
+                if light_side:
+                    relationship_level = min(100, relationship_level + 10)
+                    trust_level = min(100, trust_level + 5)
                     reactions.append(f"{npc.npc_name} feels the Light Side strengthen in you")
-                elif 'sith' in personality or 'dark_side' in personality:
-                    npc.relationship_level = max(-100, npc.relationship_level - 10)
+                elif dark_side:
+                    relationship_level = max(-100, relationship_level - 10)
                     reactions.append(f"{npc.npc_name} is disgusted by your weakness")
         
         # Non-Force sensitive NPCs react to corruption and obvious displays
         else:
             if alignment.corruption_level > 50:
-                npc.fear_level = min(100, npc.fear_level + 5)
+                fear_level = min(100, fear_level + 5)
                 if alignment.corruption_level > 80:
                     reactions.append(f"{npc.npc_name} is unsettled by your changed appearance")
         
         # Update NPC memory with Force event
-        interaction_history = json.loads(npc.interaction_history) if npc.interaction_history else []
-        interaction_history.append({
-            'timestamp': datetime.utcnow().isoformat(),
-            'type': 'force_event_witnessed',
-            'action_type': action_type,
-            'alignment_change': alignment.net_alignment
+        updates.append({
+            'b_id': npc.id,
+            'b_fear_level': fear_level,
+            'b_relationship_level': relationship_level,
+            'b_trust_level': trust_level
         })
-        npc.interaction_history = json.dumps(interaction_history[-20:])
-        npc.last_interaction = datetime.utcnow()
     
-    db.session.commit()
+    if updates:
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('b_id'))
+            .values(
+                fear_level=bindparam('b_fear_level'),
+                relationship_level=bindparam('b_relationship_level'),
+                trust_level=bindparam('b_trust_level'),
+                interaction_history=append_json_item(db.engine, table.c.interaction_history, witnessed, 20),
+                last_interaction=now
+            ),
+            updates
+        )
+    
     return reactions
 
 def update_faction_force_awareness(faction_name, user, magnitude, session_id):
@@ -260,52 +371,39 @@ def check_force_power_unlocks(alignment):
     """
     Check for newly unlocked Force powers based on alignment and experience
     """
-    unlocked = []
-    current_powers = json.loads(alignment.force_powers) if alignment.force_powers else []
+    eligible = set()
+    current_powers = set(alignment.force_powers or ())
     
     total_force_exp = alignment.light_side_points + alignment.dark_side_points
     net_alignment = alignment.net_alignment
     
-    # Basic powers
-    if 'Force Sense' not in current_powers and total_force_exp >= 10:
-        current_powers.append('Force Sense')
-        unlocked.append('Force Sense')
-    
-    if 'Force Push' not in current_powers and total_force_exp >= 25:
-        current_powers.append('Force Push')
-        unlocked.append('Force Push')
-    
-    # Light Side powers
-    if net_alignment >= 25:
-        if 'Force Heal' not in current_powers and total_force_exp >= 40:
-            current_powers.append('Force Heal')
-            unlocked.append('Force Heal')
-        
-        if 'Battle Meditation' not in current_powers and net_alignment >= 60 and total_force_exp >= 80:
-            current_powers.append('Battle Meditation')
-            unlocked.append('Battle Meditation')
-    
-    # Dark Side powers
-    if net_alignment <= -25:
-        if 'Force Choke' not in current_powers and total_force_exp >= 30:
-            current_powers.append('Force Choke')
-            unlocked.append('Force Choke')
+    for power, reqs in FORCE_POWERS_BY_EXPERIENCE:
+        # Requirements are sorted by experience, so the rest are out of reach
+        if total_force_exp < reqs['exp']:
+            break
         
-        if 'Force Lightning' not in current_powers and net_alignment <= -60 and total_force_exp >= 100:
-            current_powers.append('Force Lightning')
-            unlocked.append('Force Lightning')
+        if power not in current_powers and meets_alignment_requirement(reqs['alignment'], net_alignment):
+            eligible.add(power)
     
-    # Gray/Balanced powers
-    if -25 <= net_alignment <= 25:
-        if 'Force Stealth' not in current_powers and total_force_exp >= 50:
-            current_powers.append('Force Stealth')
-            unlocked.append('Force Stealth')
+    # Learn new powers in declaration order
+    unlocked = [power for power in FORCE_POWER_REQUIREMENTS if power in eligible]
     
     # Update powers list
-    alignment.force_powers = json.dumps(current_powers)
+    if unlocked:
+        alignment.force_powers = [*(alignment.force_powers or []), *unlocked]
     
     return unlocked
 
+def meets_alignment_requirement(requirement, net_alignment):
+    """Check a net alignment against a Force power's alignment requirement"""
+    if requirement is None:
+        return True
+    if requirement == 'balanced':
+        return -25 <= net_alignment <= 25
+    if requirement > 0:
+        return net_alignment >= requirement
+    return net_alignment <= requirement
+
 def generate_force_vision(user, trigger='meditation', session_id=None):
     """
     Generate Force visions based on alignment and galaxy state
@@ -320,37 +418,37 @@ def generate_force_vision(user, trigger='meditation', session_id=None):
         return None
     
     # Get current galaxy state for vision context
-    session = SessionState.query.filter_by(session_id=session_id).first() if session_id else None
+    def current_session():
+        return SessionState.query.filter_by(session_id=session_id).first() if session_id else None
     
+    # Only the chosen vision is generated
     vision_types = {
-        'future_conflict': generate_conflict_vision(alignment, session),
-        'past_echo': generate_past_echo_vision(alignment),
-        'force_nexus': generate_nexus_vision(alignment),
-        'personal_destiny': generate_destiny_vision(alignment, user),
-        'galactic_consequence': generate_consequence_vision(alignment, session)
+        'future_conflict': lambda: generate_conflict_vision(alignment, current_session()),
+        'past_echo': lambda: generate_past_echo_vision(alignment),
+        'force_nexus': lambda: generate_nexus_vision(alignment),
+        'personal_destiny': lambda: generate_destiny_vision(alignment, user),
+        'galactic_consequence': lambda: generate_consequence_vision(alignment, current_session())
     }
     
     # Select vision type based on alignment and trigger
     if alignment.net_alignment > 50:
-        vision_weights = {'future_conflict': 20, 'past_echo': 30, 'personal_destiny': 30, 'galactic_consequence': 20}
+        population, cum_weights = LIGHT_SIDE_VISION_TYPES
     elif alignment.net_alignment < -50:
-        vision_weights = {'future_conflict': 35, 'force_nexus': 25, 'personal_destiny': 25, 'galactic_consequence': 15}
+        population, cum_weights = DARK_SIDE_VISION_TYPES
     else:
-        vision_weights = {'past_echo': 20, 'force_nexus': 30, 'personal_destiny': 25, 'galactic_consequence': 25}
+        population, cum_weights = BALANCED_VISION_TYPES
     
-    vision_type = weighted_random_choice(vision_weights)
-    vision_data = vision_types[vision_type]
+    vision_type = random.choices(population, cum_weights=cum_weights)[0]
+    vision_data = vision_types[vision_type]()
     
     # Record vision in Force events
-    force_events = json.loads(alignment.force_events) if alignment.force_events else []
-    force_events.append({
+    append_history(alignment, 'force_events', {
         'timestamp': datetime.utcnow().isoformat(),
         'type': 'vision',
         'vision_type': vision_type,
         'trigger': trigger,
         'content': vision_data['vision_text']
-    })
-    alignment.force_events = json.dumps(force_events[-50:])
+    }, 50)
     
     db.session.commit()
     
@@ -358,14 +456,8 @@ def generate_force_vision(user, trigger='meditation', session_id=None):
 
 def generate_conflict_vision(alignment, session):
     """Generate vision of future conflicts"""
-    visions = [
-        "You see flashes of starships engaged in fierce battle, the outcome uncertain.",
-        "A vision of worlds in flames, empires rising and falling in the galactic dance.",
-        "You witness a confrontation between Force users, lightsabers clashing in darkness."
-    ]
-    
     return {
-        'vision_text': random.choice(visions),
+        'vision_text': random.choice(CONFLICT_VISIONS),
         'vision_type': 'future_conflict',
         'future_hints': ['Prepare for battle', 'Allies will be crucial', 'Choices matter'],
         'force_magnitude': random.randint(3, 7)
@@ -373,28 +465,16 @@ def generate_conflict_vision(alignment, session):
 
 def generate_past_echo_vision(alignment):
     """Generate vision of past events"""
-    visions = [
-        "Ancient Jedi walk the halls of a temple long since fallen to ruin.",
-        "You feel the echo of a great betrayal, Jedi turning against their masters.",
-        "Sith Lords of old whisper secrets of power and domination."
-    ]
-    
     return {
-        'vision_text': random.choice(visions),
+        'vision_text': random.choice(PAST_ECHO_VISIONS),
         'vision_type': 'past_echo',
         'force_magnitude': random.randint(2, 5)
     }
 
 def generate_nexus_vision(alignment):
     """Generate vision related to Force nexus points"""
-    visions = [
-        "A hidden temple calls to you, its location just beyond clear memory.",
-        "You sense a disturbance in the Force, centered on a place of great power.",
-        "Dark energies swirl around an ancient stronghold, begging investigation."
-    ]
-    
     return {
-        'vision_text': random.choice(visions),
+        'vision_text': random.choice(NEXUS_VISIONS),
         'vision_type': 'force_nexus',
         'future_hints': ['Seek the hidden temple', 'Power awaits the worthy'],
         'force_magnitude': random.randint(4, 8)
@@ -403,23 +483,11 @@ def generate_nexus_vision(alignment):
 def generate_destiny_vision(alignment, user):
     """Generate personal destiny vision"""
     if alignment.net_alignment > 25:
-        visions = [
-            "You see yourself standing as a beacon of hope in dark times.",
-            "A vision of you training others in the ways of the Light.",
-            "You witness yourself making a choice that saves countless lives."
-        ]
+        visions = LIGHT_SIDE_DESTINY_VISIONS
     elif alignment.net_alignment < -25:
-        visions = [
-            "You see yourself wielding power over others, bending them to your will.",
-            "A vision of conquest, systems falling before your might.",
-            "You witness yourself standing triumphant over fallen enemies."
-        ]
+        visions = DARK_SIDE_DESTINY_VISIONS
     else:
-        visions = [
-            "You see yourself walking a path between light and darkness.",
-            "A vision of you making choices that will define your legacy.",
-            "You witness yourself bringing balance to a divided galaxy."
-        ]
+        visions = BALANCED_DESTINY_VISIONS
     
     return {
         'vision_text': random.choice(visions),
@@ -430,14 +498,8 @@ def generate_destiny_vision(alignment, user):
 
 def generate_consequence_vision(alignment, session):
     """Generate vision of galactic consequences"""
-    visions = [
-        "You see the ripple effects of your actions spreading across star systems.",
-        "A vision of how your choices shape the fate of countless beings.",
-        "You witness the long-term consequences of decisions yet to be made."
-    ]
-    
     return {
-        'vision_text': random.choice(visions),
+        'vision_text': random.choice(CONSEQUENCE_VISIONS),
         'vision_type': 'galactic_consequence',
         'future_hints': ['Every action has consequences', 'Think beyond the immediate'],
         'force_magnitude': random.randint(2, 6)
@@ -451,7 +513,7 @@ def use_force_power(user, power_name, target='', intent='neutral', power_level=1
     if not alignment or not alignment.force_sensitive:
         return {'success': False, 'effect_description': 'You are not Force-sensitive'}
     
-    available_powers = json.loads(alignment.force_powers) if alignment.force_powers else []
+    available_powers = list(alignment.force_powers or [])
     if power_name not in available_powers:
         return {'success': False, 'effect_description': f'You have not learned {power_name}'}
     
@@ -473,11 +535,12 @@ def use_force_power(user, power_name, target='', intent='neutral', power_level=1
     
     # Update alignment if significant impact
     if abs(alignment_change) >= 3:
-        update_force_alignment(
-            user=user,
+        _apply_alignment_change(
+            alignment,
             action_type='dark' if alignment_change < 0 else 'light',
             action_description=f"Used {power_name} with {intent} intent",
             force_magnitude=abs(alignment_change) // 3,
+            witnesses=[],
             session_id=session_id
         )
     
@@ -622,10 +685,11 @@ def update_power_witnesses(user, power_name, target, session_id):
     # This would integrate with the NPC system to find nearby NPCs
     # For now, return placeholder
     witnesses = []
+    now = datetime.utcnow()
     
     # Find NPCs that might have witnessed this
     recent_npcs = NPCMemory.query.filter_by(user=user).filter(
-        NPCMemory.last_interaction > datetime.utcnow() - timedelta(hours=1)
+        NPCMemory.last_interaction > now - timedelta(hours=1)
     ).all()
     
     for npc in recent_npcs:
@@ -634,14 +698,12 @@ def update_power_witnesses(user, power_name, target, session_id):
             witnesses.append(npc.npc_name)
             
             # Record in interaction history
-            interaction_history = json.loads(npc.interaction_history) if npc.interaction_history else []
-            interaction_history.append({
-                'timestamp': datetime.utcnow().isoformat(),
+            append_history(npc, 'interaction_history', {
+                'timestamp': now.isoformat(),
                 'type': 'force_power_witnessed',
                 'power': power_name,
                 'target': target
-            })
-            npc.interaction_history = json.dumps(interaction_history[-20:])
+            }, 20)
     
     db.session.commit()
     return witnesses
@@ -666,26 +728,16 @@ def get_force_powers(user):
             'force_sensitive': False
         }
     
-    available = json.loads(alignment.force_powers) if alignment.force_powers else []
+    available = list(alignment.force_powers or [])
+    learned = set(available)
     total_exp = alignment.light_side_points + alignment.dark_side_points
     net_alignment = alignment.net_alignment
     
-    # Define all possible powers with requirements
-    all_powers = {
-        'Force Sense': {'exp': 10, 'alignment': None},
-        'Force Push': {'exp': 25, 'alignment': None},
-        'Force Heal': {'exp': 40, 'alignment': 25},
-        'Battle Meditation': {'exp': 80, 'alignment': 60},
-        'Force Choke': {'exp': 30, 'alignment': -25},
-        'Force Lightning': {'exp': 100, 'alignment': -60},
-        'Force Stealth': {'exp': 50, 'alignment': 'balanced'}
-    }
-    
     locked = []
     requirements = {}
     
-    for power, reqs in all_powers.items():
-        if power not in available:
+    for power, reqs in FORCE_POWER_REQUIREMENTS.items():
+        if power not in learned:
             if total_exp < reqs['exp']:
                 locked.append(power)
                 requirements[power] = f"Requires {reqs['exp']} Force experience (current: {total_exp})"
@@ -776,17 +828,16 @@ def meditate(user, meditation_type='balance', duration='short', location='unknow
             alignment.dark_side_points += abs(alignment_change)
         
         # Record meditation in Force events
-        force_events = json.loads(alignment.force_events) if alignment.force_events else []
-        force_events.append({
-            'timestamp': datetime.utcnow().isoformat(),
+        now = datetime.utcnow()
+        append_history(alignment, 'force_events', {
+            'timestamp': now.isoformat(),
             'type': 'meditation',
             'meditation_type': meditation_type,
             'duration': duration,
             'location': location,
             'alignment_change': alignment_change
-        })
-        alignment.force_events = json.dumps(force_events[-50:])
-        alignment.last_force_event = datetime.utcnow()
+        }, 50)
+        alignment.last_force_event = now
     
     db.session.commit()
     
@@ -799,6 +850,26 @@ def meditate(user, meditation_type='balance', duration='short', location='unknow
     }
 
 # Helper functions
+def append_history(row, key, item, keep_last):
+    """
+    Append item to one of row's JSON history columns, keeping the last keep_last
+    
+    Stored rows get the append as a SQL expression so the flush sends only the
+    new item; a pending row has nothing stored yet and takes a plain list.
+    Until the next flush a stored row's attribute holds that expression rather
+    than a list, and a second append to the same column would build on the
+    stored value and drop the first, so that raises RuntimeError; flush
+    between appends to one column.
+    """
+    if row.id is None:
+        setattr(row, key, [*(getattr(row, key) or []), item][-keep_last:])
+        return
+    
+    if isinstance(row.__dict__.get(key), ClauseElement):
+        raise RuntimeError(f'{type(row).__name__}.{key} already has an unflushed append')
+    
+    setattr(row, key, append_json_item(db.engine, type(row).__table__.c[key], item, keep_last))
+
 def has_recent_consequence(user, consequence_type):
     """Check if user has had a specific consequence recently"""
     # This would check a consequences table or cache
@@ -810,16 +881,3 @@ def mark_consequence(user, consequence_type):
     # This would store the consequence with timestamp
     # For now, just pass
     pass
-
-def weighted_random_choice(weights):
-    """Select a random choice based on weights dictionary"""
-    total_weight = sum(weights.values())
-    roll = random.randint(1, total_weight)
-    
-    cumulative = 0
-    for choice, weight in weights.items():
-        cumulative += weight
-        if roll <= cumulative:
-            return choice
-    
-    return list(weights.keys())[0]  # Fallback
@@ -1,20 +1,54 @@
-from app import db
+from app import app, db, executor
 from models import NPCMemory, ForceAlignment, ThreatLevel
-import json
+from sqlalchemy import select
+from sqlalchemy.orm import raiseload
+import logging
 import random
 from datetime import datetime, timedelta
+from functools import lru_cache
 
-def update_npc_interaction(npc_name, user, interaction_type, interaction_data, session_id=None):
+logger = logging.getLogger(__name__)
+
+# Dialogue prompts, filled with str.format_map per request
+NEUTRAL_NPC_SYSTEM_PROMPT = "You are a neutral NPC in the Star Wars universe. Respond appropriately to the situation."
+
+NPC_SYSTEM_PROMPT_TEMPLATE = """You are {npc_name}, an NPC in the Star Wars universe.
+    
+Personality: {personality}
+Faction: {faction}
+Current mood: {mood}
+
+Relationship with player: {relationship}
+Knowledge about player: {knowledge}
+
+Respond in character, taking into account your personality, relationship with the player, and what you know about them. Keep responses concise and immersive."""
+
+NPC_USER_PROMPT_TEMPLATE = """Current situation: {situation}
+Player's recent action: {player_action}
+
+How do you respond?"""
+
+# Personality trait categories used to describe an NPC
+SOCIAL_TRAITS = frozenset(['friendly', 'suspicious', 'honest', 'deceitful', 'tolerant', 'xenophobic'])
+BEHAVIORAL_TRAITS = frozenset(['greedy', 'loyal', 'ambitious', 'cowardly', 'brave', 'aggressive', 'peaceful'])
+AFFILIATION_TRAITS = frozenset(['imperial_sympathizer', 'rebel_sympathizer', 'criminal', 'law_abiding'])
+FORCE_TRAITS = frozenset(['force_sensitive', 'jedi', 'sith', 'dark_side', 'light_side'])
+PROFESSION_TRAITS = frozenset(['merchant', 'noble', 'bounty_hunter', 'pilot', 'mechanic', 'doctor', 'scholar'])
+
+def update_npc_interaction(npc_name, user, interaction_type, interaction_data, session_id=None, npc_memory=None):
     """
     Update NPC memory with new interaction - core of reactive NPC system
+    
+    Pass npc_memory when the caller already loaded the row in this session to skip the lookup.
     """
     # Get or create NPC memory
-    npc_memory = NPCMemory.query.filter_by(npc_name=npc_name, user=user).first()
+    if npc_memory is None:
+        npc_memory = NPCMemory.query.filter_by(npc_name=npc_name, user=user).first()
     if not npc_memory:
         npc_memory = create_new_npc_memory(npc_name, user, session_id)
     
     # Update interaction history
-    interaction_history = json.loads(npc_memory.interaction_history) if npc_memory.interaction_history else []
+    interaction_history = list(npc_memory.interaction_history or [])
     
     new_interaction = {
         'timestamp': datetime.utcnow().isoformat(),
@@ -23,7 +57,7 @@ def update_npc_interaction(npc_name, user, interaction_type, interaction_data, s
     }
     
     interaction_history.append(new_interaction)
-    npc_memory.interaction_history = json.dumps(interaction_history[-30:])  # Keep last 30 interactions
+    npc_memory.interaction_history = interaction_history[-30:]  # Keep last 30 interactions
     
     # Update relationship levels based on interaction
     relationship_change = calculate_relationship_change(interaction_type, interaction_data, npc_memory)
@@ -53,6 +87,30 @@ def update_npc_interaction(npc_name, user, interaction_type, interaction_data, s
         'new_mood': npc_memory.current_mood
     }
 
+def _update_npc_interaction_in_context(**kwargs):
+    """
+    Run update_npc_interaction on a worker thread with its own app context and session
+    """
+    with app.app_context():
+        try:
+            update_npc_interaction(**kwargs)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Background NPC memory update failed for %s", kwargs.get('npc_name'))
+
+def submit_npc_interaction(npc_name, user, interaction_type, interaction_data, session_id=None):
+    """
+    Queue an NPC memory update on the background executor so the response is not held up by the write
+    """
+    return executor.submit(
+        _update_npc_interaction_in_context,
+        npc_name=npc_name,
+        user=user,
+        interaction_type=interaction_type,
+        interaction_data=interaction_data,
+        session_id=session_id
+    )
+
 def create_new_npc_memory(npc_name, user, session_id):
     """
     Create new NPC memory with randomized personality
@@ -84,7 +142,7 @@ def create_new_npc_memory(npc_name, user, session_id):
         trust_level=random.randint(10, 40),
         fear_level=random.randint(0, 20),
         npc_faction=faction,
-        personality_traits=json.dumps(personality_traits),
+        personality_traits=personality_traits,
         current_mood='neutral',
         session_id=session_id
     )
@@ -148,7 +206,7 @@ def calculate_relationship_change(interaction_type, interaction_data, npc_memory
     """
     Calculate relationship change based on interaction type and NPC personality
     """
-    personality_traits = json.loads(npc_memory.personality_traits) if npc_memory.personality_traits else []
+    personality_traits = npc_memory.personality_traits or []
     base_change = 0
     
     # Base changes by interaction type
@@ -225,7 +283,7 @@ def calculate_trust_fear_changes(interaction_type, interaction_data, npc_memory)
     """
     Calculate changes to trust and fear levels
     """
-    personality_traits = json.loads(npc_memory.personality_traits) if npc_memory.personality_traits else []
+    personality_traits = npc_memory.personality_traits or []
     trust_change = 0
     fear_change = 0
     
@@ -278,7 +336,7 @@ def update_npc_knowledge(npc_memory, interaction_type, interaction_data, user):
     """
     Update NPC's knowledge about the player's actions and reputation
     """
-    known_actions = json.loads(npc_memory.known_player_actions) if npc_memory.known_player_actions else []
+    known_actions = list(npc_memory.known_player_actions or [])
     
     # Get player's current threat level and Force alignment for context
     threat_level = ThreatLevel.query.filter_by(user=user).first()
@@ -291,7 +349,7 @@ def update_npc_knowledge(npc_memory, interaction_type, interaction_data, user):
     }
     
     # What the NPC learns depends on interaction type and their connections
-    personality_traits = json.loads(npc_memory.personality_traits) if npc_memory.personality_traits else []
+    personality_traits = npc_memory.personality_traits or []
     
     if interaction_type == 'force_power_witnessed':
         new_knowledge['learned_info'].append(f"Player is Force-sensitive")
@@ -338,7 +396,7 @@ def update_npc_knowledge(npc_memory, interaction_type, interaction_data, user):
     # Only add if NPC learned something new
     if new_knowledge['learned_info']:
         known_actions.append(new_knowledge)
-        npc_memory.known_player_actions = json.dumps(known_actions[-20:])  # Keep last 20 pieces of knowledge
+        npc_memory.known_player_actions = known_actions[-20:]  # Keep last 20 pieces of knowledge
 
 def get_faction_specific_knowledge(faction, user, threat_level):
     """
@@ -375,7 +433,7 @@ def calculate_npc_mood(npc_memory):
     fear = npc_memory.fear_level
     
     # Get recent interactions (last 5)
-    interaction_history = json.loads(npc_memory.interaction_history) if npc_memory.interaction_history else []
+    interaction_history = npc_memory.interaction_history or []
     recent_interactions = interaction_history[-5:]
     
     # Count positive vs negative recent interactions
@@ -406,22 +464,35 @@ def get_npc_memory(npc_name, user, session_id=None):
     """
     return NPCMemory.query.filter_by(npc_name=npc_name, user=user).first()
 
+def fetch_npc_dialogue_context(npc_name, user, situation='', player_action='', session_id=None):
+    """
+    Load an NPC's memory in a single SELECT and build its dialogue context from it
+    
+    Returns (npc_memory, context); hand npc_memory back to update_npc_interaction
+    so recording the exchange does not look the row up again.
+    """
+    npc_memory = db.session.execute(
+        select(NPCMemory).options(raiseload('*')).filter_by(npc_name=npc_name, user=user).limit(1)
+    ).scalar_one_or_none()
+    
+    return npc_memory, build_npc_context(npc_memory, situation, player_action)
+
 def build_npc_context(npc_memory, situation='', player_action=''):
     """
     Build context for NPC dialogue generation based on memory and current situation
     """
     if not npc_memory:
         return {
-            'system_prompt': "You are a neutral NPC in the Star Wars universe. Respond appropriately to the situation.",
+            'system_prompt': NEUTRAL_NPC_SYSTEM_PROMPT,
             'user_prompt': f"Situation: {situation}. Player action: {player_action}",
             'metadata': {'relationship': 0, 'mood': 'neutral'}
         }
     
-    personality_traits = json.loads(npc_memory.personality_traits) if npc_memory.personality_traits else []
-    known_actions = json.loads(npc_memory.known_player_actions) if npc_memory.known_player_actions else []
+    personality_traits = npc_memory.personality_traits or []
+    known_actions = npc_memory.known_player_actions or []
     
-    # Build personality description
-    personality_desc = build_personality_description(personality_traits)
+    # Build personality description; traits are fixed per NPC, so it is memoized
+    personality_desc = build_personality_description(tuple(personality_traits))
     
     # Build relationship context
     relationship_context = build_relationship_context(npc_memory)
@@ -429,23 +500,18 @@ def build_npc_context(npc_memory, situation='', player_action=''):
     # Build knowledge context
     knowledge_context = build_knowledge_context(known_actions)
     
-    # Build system prompt
-    system_prompt = f"""You are {npc_memory.npc_name}, an NPC in the Star Wars universe.
-    
-Personality: {personality_desc}
-Faction: {npc_memory.npc_faction}
-Current mood: {npc_memory.current_mood}
-
-Relationship with player: {relationship_context}
-Knowledge about player: {knowledge_context}
-
-Respond in character, taking into account your personality, relationship with the player, and what you know about them. Keep responses concise and immersive."""
-    
-    # Build user prompt
-    user_prompt = f"""Current situation: {situation}
-Player's recent action: {player_action}
-
-How do you respond?"""
+    system_prompt = NPC_SYSTEM_PROMPT_TEMPLATE.format_map({
+        'npc_name': npc_memory.npc_name,
+        'personality': personality_desc,
+        'faction': npc_memory.npc_faction,
+        'mood': npc_memory.current_mood,
+        'relationship': relationship_context,
+        'knowledge': knowledge_context
+    })
+    user_prompt = NPC_USER_PROMPT_TEMPLATE.format_map({
+        'situation': situation,
+        'player_action': player_action
+    })
     
     # Calculate relationship change potential
     relationship_change = 0
@@ -467,19 +533,20 @@ How do you respond?"""
         'relationship_change': relationship_change
     }
 
+@lru_cache(maxsize=4096)
 def build_personality_description(personality_traits):
     """
-    Build human-readable personality description from traits
+    Build human-readable personality description from a tuple of traits
     """
     if not personality_traits:
         return "A typical individual with no distinctive personality traits."
     
     # Group traits by category
-    social_traits = [t for t in personality_traits if t in ['friendly', 'suspicious', 'honest', 'deceitful', 'tolerant', 'xenophobic']]
-    behavioral_traits = [t for t in personality_traits if t in ['greedy', 'loyal', 'ambitious', 'cowardly', 'brave', 'aggressive', 'peaceful']]
-    affiliation_traits = [t for t in personality_traits if t in ['imperial_sympathizer', 'rebel_sympathizer', 'criminal', 'law_abiding']]
-    force_traits = [t for t in personality_traits if t in ['force_sensitive', 'jedi', 'sith', 'dark_side', 'light_side']]
-    profession_traits = [t for t in personality_traits if t in ['merchant', 'noble', 'bounty_hunter', 'pilot', 'mechanic', 'doctor', 'scholar']]
+    social_traits = [t for t in personality_traits if t in SOCIAL_TRAITS]
+    behavioral_traits = [t for t in personality_traits if t in BEHAVIORAL_TRAITS]
+    affiliation_traits = [t for t in personality_traits if t in AFFILIATION_TRAITS]
+    force_traits = [t for t in personality_traits if t in FORCE_TRAITS]
+    profession_traits = [t for t in personality_traits if t in PROFESSION_TRAITS]
     
     description_parts = []
     
@@ -574,7 +641,7 @@ def get_npc_dialogue_history(npc_name, user, limit=10):
     if not npc_memory:
         return []
     
-    interaction_history = json.loads(npc_memory.interaction_history) if npc_memory.interaction_history else []
+    interaction_history = npc_memory.interaction_history or []
     
     # Filter for dialogue interactions
     dialogue_history = [
@@ -613,7 +680,7 @@ def simulate_npc_network_effects(user, action_type, involved_npc, session_id=Non
                 npc.relationship_level = max(-100, min(100, npc.relationship_level + relationship_change))
                 
                 # Record the network effect
-                interaction_history = json.loads(npc.interaction_history) if npc.interaction_history else []
+                interaction_history = list(npc.interaction_history or [])
                 interaction_history.append({
                     'timestamp': datetime.utcnow().isoformat(),
                     'type': 'network_effect',
@@ -623,7 +690,7 @@ def simulate_npc_network_effects(user, action_type, involved_npc, session_id=Non
                         'relationship_change': relationship_change
                     }
                 })
-                npc.interaction_history = json.dumps(interaction_history[-30:])
+                npc.interaction_history = interaction_history[-30:]
                 
                 network_effects.append({
                     'npc_name': npc.npc_name,
@@ -1,20 +1,41 @@
-from app import db
-from models import QuestLog, ForceAlignment, FactionState, NPCMemory, ThreatLevel
-import json
+from app import app, db, executor
+from models import QuestLog, QuestJob, ForceAlignment, FactionState, NPCMemory, ThreatLevel, utcnow
+from services.faction_ai import update_faction_awareness
+from services.force_engine import update_force_alignment
+from sqlalchemy import insert, select, update
+from utils.db_helpers import expire_stale_job
+from utils.ids import uuid7
+from utils.json_helpers import dumps, loads
+import ast
+import logging
 import random
-from datetime import datetime
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Quest jobs run on an in-process executor and die with their worker; one
+# still queued or running after this long is reported as failed
+QUEST_JOB_TIMEOUT = timedelta(minutes=10)
+
+# Statuses a quest may leave and the status it enters, per outcome job kind
+QUEST_OUTCOME_TRANSITIONS = {
+    'complete': (('active',), 'completed'),
+    'fail': (('active', 'available'), 'failed')
+}
 
 def generate_procedural_quest(user, session_id=None, difficulty_preference='medium', quest_type_preference=None, location=None):
     """
     Generate procedural quest based on current world state, player actions, and Force alignment
     """
     # Get player context
-    force_alignment = ForceAlignment.query.filter_by(user=user).first()
-    threat_level = ThreatLevel.query.filter_by(user=user).first()
-    recent_npc_interactions = NPCMemory.query.filter_by(user=user).order_by(NPCMemory.last_interaction.desc()).limit(5).all()
+    force_alignment = db.session.scalar(select(ForceAlignment).filter_by(user=user))
+    threat_level = db.session.scalar(select(ThreatLevel).filter_by(user=user))
+    recent_npc_interactions = db.session.scalars(
+        select(NPCMemory).filter_by(user=user).order_by(NPCMemory.last_interaction.desc()).limit(5)
+    ).all()
     
     # Get current faction states
-    factions = FactionState.query.all()
+    factions = db.session.scalars(select(FactionState)).all()
     faction_tensions = calculate_faction_tensions(factions)
     
     # Determine quest generation context
@@ -240,7 +261,7 @@ def generate_personal_consequence_quest(context):
         return generate_random_quest(context)
     
     npc_name = random.choice(recent_npcs)
-    npc_memory = NPCMemory.query.filter_by(npc_name=npc_name, user=context['user']).first()
+    npc_memory = db.session.scalar(select(NPCMemory).filter_by(npc_name=npc_name, user=context['user']).limit(1))
     
     if not npc_memory:
         return generate_random_quest(context)
@@ -577,8 +598,8 @@ def evaluate_quest_completion(quest, completion_method='standard', player_choice
     Evaluate quest completion and apply rewards/consequences
     """
     # Parse quest data
-    rewards = json.loads(quest.reward) if isinstance(quest.reward, str) else quest.reward
-    faction_impact = json.loads(quest.faction_impact) if isinstance(quest.faction_impact, str) else quest.faction_impact
+    rewards = load_quest_field(quest.reward)
+    faction_impact = load_quest_field(quest.faction_impact)
     
     # Calculate completion quality based on method and choices
     completion_quality = calculate_completion_quality(completion_method, player_choices, quest.difficulty)
@@ -597,7 +618,6 @@ def evaluate_quest_completion(quest, completion_method='standard', player_choice
         force_change += 5
     
     if force_change != 0:
-        from services.force_engine import update_force_alignment
         alignment_result = update_force_alignment(
             user=quest.user,
             action_type='light' if force_change > 0 else 'dark',
@@ -674,7 +694,6 @@ def apply_faction_changes(faction_impact, user, session_id):
     
     for faction_name, impact in faction_impact.items():
         if impact != 0:
-            from services.faction_ai import update_faction_awareness
             result = update_faction_awareness(
                 faction_name=faction_name,
                 user=user,
@@ -734,12 +753,11 @@ def apply_quest_failure_consequences(quest, failure_reason, session_id):
         reputation_impact -= 20
     
     # Apply faction consequences if any
-    faction_impact = json.loads(quest.faction_impact) if isinstance(quest.faction_impact, str) else quest.faction_impact
+    faction_impact = load_quest_field(quest.faction_impact)
     for faction_name, impact in faction_impact.items():
         if impact != 0:
             # Reverse and worsen the intended impact
             failure_impact = -(abs(impact) + 5)
-            from services.faction_ai import update_faction_awareness
             result = update_faction_awareness(
                 faction_name=faction_name,
                 user=quest.user,
@@ -755,3 +773,207 @@ def apply_quest_failure_consequences(quest, failure_reason, session_id):
         'faction_changes': faction_changes,
         'reputation_impact': reputation_impact
     }
+
+def load_quest_field(value):
+    """
+    Decode a quest's JSON text column; rows written before the columns held
+    JSON store Python reprs, which are read with ast.literal_eval instead
+    """
+    if not isinstance(value, str):
+        return value
+    
+    try:
+        return loads(value)
+    except ValueError:
+        return ast.literal_eval(value)
+
+def build_quest_values(user, session_id, quest_data):
+    """
+    Column values for a new quest log row built from generated quest data
+    """
+    return {
+        'user': user,
+        'quest_title': quest_data['title'],
+        'quest_description': quest_data['description'],
+        'quest_giver': quest_data['giver'],
+        'reward': dumps(quest_data['rewards']),
+        'requirements': dumps(quest_data['requirements']),
+        'status': 'available',
+        'difficulty': quest_data['difficulty'],
+        'faction_impact': dumps(quest_data.get('faction_impact', {})),
+        'force_impact': quest_data.get('force_impact', 0),
+        'generated_reason': quest_data['generation_reason'],
+        'prerequisite_events': dumps(quest_data.get('prerequisites', [])),
+        'session_id': session_id
+    }
+
+def quest_summary(row, quest_data):
+    """
+    API representation of a freshly generated quest from its RETURNING row
+    """
+    return {
+        'id': row.id,
+        'title': quest_data['title'],
+        'description': quest_data['description'],
+        'giver': quest_data['giver'],
+        'rewards': quest_data['rewards'],
+        'requirements': quest_data['requirements'],
+        'difficulty': quest_data['difficulty'],
+        'faction_impact': quest_data.get('faction_impact', {}),
+        'force_impact': quest_data.get('force_impact', 0),
+        'generation_reason': quest_data['generation_reason'],
+        'status': 'available',
+        'created_at': row.created_at
+    }
+
+def create_procedural_quest(user, session_id=None, difficulty_preference='medium', quest_type_preference=None, location=None):
+    """
+    Generate a quest and store it; returns its summary, or None if nothing suitable was generated
+    """
+    quest_data = generate_procedural_quest(
+        user=user,
+        session_id=session_id,
+        difficulty_preference=difficulty_preference,
+        quest_type_preference=quest_type_preference,
+        location=location
+    )
+    
+    if not quest_data:
+        return None
+    
+    # A single INSERT ... RETURNING, skipping the unit of work and any refresh
+    # of the database-generated id and timestamp after the commit
+    row = db.session.execute(
+        insert(QuestLog)
+        .values(**build_quest_values(user, session_id, quest_data))
+        .returning(QuestLog.id, QuestLog.created_at)
+    ).one()
+    db.session.commit()
+    
+    return quest_summary(row, quest_data)
+
+def complete_quest_outcome(quest, completion_method='standard', player_choices=[], session_id=None):
+    """
+    Apply a completed quest's rewards and consequences and return the completion payload
+    """
+    completion_result = evaluate_quest_completion(
+        quest=quest,
+        completion_method=completion_method,
+        player_choices=player_choices,
+        session_id=session_id
+    )
+    db.session.commit()
+    
+    return {
+        'quest_id': quest.id,
+        'title': quest.quest_title,
+        'completion_result': completion_result,
+        'rewards_granted': completion_result.get('rewards', []),
+        'faction_changes': completion_result.get('faction_changes', {}),
+        'force_alignment_change': completion_result.get('force_change', 0),
+        'consequences': completion_result.get('consequences', [])
+    }
+
+def fail_quest_outcome(quest, failure_reason='unknown', session_id=None):
+    """
+    Apply a failed quest's consequences and return the failure payload
+    """
+    failure_result = apply_quest_failure_consequences(
+        quest=quest,
+        failure_reason=failure_reason,
+        session_id=session_id
+    )
+    db.session.commit()
+    
+    return {
+        'quest_id': quest.id,
+        'title': quest.quest_title,
+        'failure_reason': failure_reason,
+        'consequences': failure_result.get('consequences', []),
+        'faction_changes': failure_result.get('faction_changes', {}),
+        'reputation_impact': failure_result.get('reputation_impact', 0)
+    }
+
+def transition_quest(quest_id, user, from_statuses, **values):
+    """
+    Move a player's quest out of one of from_statuses with a single guarded UPDATE
+    
+    Concurrent transitions of the same quest cannot both succeed, since only
+    one UPDATE still matches the old status. Returns (quest row, None) on
+    success, otherwise (None, current status), which is None if the quest
+    does not exist. The caller commits.
+    """
+    table = QuestLog.__table__
+    quest = db.session.execute(
+        update(table)
+        .where(table.c.id == quest_id, table.c.user == user, table.c.status.in_(from_statuses))
+        .values(**values)
+        .returning(*table.c)
+    ).first()
+    
+    if quest:
+        return quest, None
+    
+    return None, db.session.execute(
+        select(table.c.status).where(table.c.id == quest_id, table.c.user == user)
+    ).scalar()
+
+def submit_quest_job(kind, user, quest_id=None, **params):
+    """
+    Queue quest generation ('generate') or outcome evaluation ('complete', 'fail')
+    on the background executor and return its job row
+    
+    Outcome jobs move the quest to its new status themselves, so the status
+    change commits with the rewards and consequences and a job lost with its
+    worker leaves the quest untouched.
+    """
+    job = QuestJob(id=uuid7().hex, kind=kind, user=user, quest_id=quest_id, status='queued')
+    db.session.add(job)
+    db.session.commit()
+    
+    # The worker looks the job up by id, so it must be committed before submitting
+    executor.submit(_run_quest_job, job.id, kind, user, quest_id, params)
+    return job
+
+def _run_quest_job(job_id, kind, user, quest_id, params):
+    """
+    Run a queued quest job with its own app context and record the outcome on the job row
+    """
+    with app.app_context():
+        db.session.execute(update(QuestJob).filter_by(id=job_id).values(status='running'))
+        db.session.commit()
+        
+        try:
+            if kind == 'generate':
+                result = create_procedural_quest(user, **params)
+                if result is None:
+                    raise LookupError('No suitable quest could be generated at this time')
+                quest_id = result['id']
+            else:
+                from_statuses, status = QUEST_OUTCOME_TRANSITIONS[kind]
+                quest, current_status = transition_quest(
+                    quest_id, user, from_statuses, status=status, completed_at=datetime.utcnow()
+                )
+                if not quest:
+                    raise LookupError(f'Quest cannot be moved to {status} (current status: {current_status})')
+                
+                if kind == 'complete':
+                    result = complete_quest_outcome(quest, **params)
+                else:
+                    result = fail_quest_outcome(quest, **params)
+            outcome = {'status': 'finished', 'result': result, 'quest_id': quest_id}
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("Background quest %s job %s failed", kind, job_id)
+            outcome = {'status': 'failed', 'error': str(e)}
+        
+        db.session.execute(
+            update(QuestJob).filter_by(id=job_id).values(finished_at=utcnow(), **outcome)
+        )
+        db.session.commit()
+
+def expire_stale_quest_job(job):
+    """
+    Mark a quest job failed once it has been queued or running past QUEST_JOB_TIMEOUT
+    """
+    return expire_stale_job(db.session, job, QUEST_JOB_TIMEOUT, 'Quest job did not finish before its worker stopped')
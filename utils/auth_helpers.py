@@ -2,24 +2,27 @@ from functools import wraps
 from flask import request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 import jwt
+import hmac
 import logging
 
 logger = logging.getLogger(__name__)
 
 # The magical Bearer token that grants access
 MAGIC_TOKEN = "Abracadabra"
+_MAGIC_TOKEN_BYTES = MAGIC_TOKEN.encode()
+_BEARER_PREFIX = b'Bearer '
 
 def check_bearer_auth():
     """
     Helper function to check Bearer token in requests
     """
-    auth_header = request.headers.get('Authorization', '')
+    # Header values are latin-1 decoded by Werkzeug, so this round-trips exactly
+    auth_header = request.headers.get('Authorization', '').encode('latin-1')
     
-    if not auth_header.startswith('Bearer '):
+    if not auth_header.startswith(_BEARER_PREFIX):
         return False
     
-    token = auth_header.split('Bearer ')[1].strip()
-    return token == MAGIC_TOKEN
+    return hmac.compare_digest(auth_header[len(_BEARER_PREFIX):].strip(), _MAGIC_TOKEN_BYTES)
 
 def require_bearer_auth(f):
     """
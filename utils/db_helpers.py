@@ -0,0 +1,65 @@
+from datetime import datetime
+from sqlalchemy import case, func, literal, tuple_, update
+from sqlalchemy.dialects.postgresql import JSONB
+from utils.json_helpers import dumps
+
+def append_json_item(engine, column, item, keep_last=None):
+    """
+    SQL expression appending item to the JSON array in column
+    
+    Only the new item is sent to the database instead of the re-serialized
+    list. With keep_last the oldest entry is dropped once the array holds
+    that many, so the column behaves like a fixed-size deque.
+    """
+    if engine.dialect.name == 'postgresql':
+        current = func.coalesce(column, literal([], JSONB))
+        if keep_last:
+            current = case((func.jsonb_array_length(current) >= keep_last, current.op('-')(0)), else_=current)
+        return current.op('||')(literal([item], JSONB))
+    
+    current = func.coalesce(column, '[]')
+    if keep_last:
+        current = case((func.json_array_length(current) >= keep_last, func.json_remove(current, '$[0]')), else_=current)
+    return func.json_insert(current, '$[#]', func.json(dumps(item)))
+
+def expire_stale_job(session, job, timeout, error):
+    """
+    Mark a background job failed once it has been queued or running longer than timeout
+    
+    Jobs run on the in-process executor and are lost with their worker, so
+    without this a client would poll them forever. The guarded UPDATE leaves
+    a job alone if its worker finishes it first. Returns True if the job was
+    expired; the caller should reload it.
+    """
+    if job.status not in ('queued', 'running') or job.created_at > datetime.utcnow() - timeout:
+        return False
+    
+    model = type(job)
+    expired = session.execute(
+        update(model)
+        .where(model.id == job.id, model.status.in_(('queued', 'running')))
+        .values(status='failed', error=error, finished_at=datetime.utcnow())
+    ).rowcount
+    session.commit()
+    return bool(expired)
+
+def keyset_cursor(timestamp, row_id):
+    """
+    Opaque pagination cursor for the last row of a page ordered by (timestamp, id) descending
+    """
+    return f'{timestamp.isoformat()},{row_id}'
+
+def before_keyset_cursor(cursor, timestamp_column, id_column):
+    """
+    Filter for rows after cursor in (timestamp, id) descending order
+    
+    The id breaks ties between rows sharing a timestamp, such as quests from
+    one batch insert. A bare ISO timestamp is also accepted. Raises
+    ValueError if the cursor cannot be parsed.
+    """
+    timestamp, _, row_id = cursor.partition(',')
+    timestamp = datetime.fromisoformat(timestamp)
+    
+    if not row_id:
+        return timestamp_column < timestamp
+    return tuple_(timestamp_column, id_column) < (timestamp, int(row_id))
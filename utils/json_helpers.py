@@ -0,0 +1,166 @@
+import orjson
+from functools import wraps
+from flask import current_app, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is several times faster than the stdlib json module for both
+# parsing and emitting, which matters on endpoints that (de)serialize
+# stored game state once per row.
+loads = orjson.loads
+
+# Target size of each write when streaming a JSON list
+STREAM_CHUNK_SIZE = 16 * 1024
+
+def dumps(obj):
+    """
+    Serialize an object to a JSON string for storage in Text columns
+    """
+    return orjson.dumps(obj).decode()
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson, so jsonify and request.get_json use it
+    """
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response without a str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def json_response(payload, status_code=200):
+    """
+    Build a JSON response with orjson instead of Flask's stdlib-backed jsonify
+    """
+    return current_app.response_class(
+        orjson.dumps(payload),
+        status=status_code,
+        mimetype='application/json'
+    )
+
+def stream_json_list(key, load_rows, encode_row, head=None, total_key=None, tail=None):
+    """
+    Stream {**head, key: [...], total_key: count, **tail(count, last_row)} while rows are still being read
+    
+    load_rows is called inside the stream rather than in the view, because the
+    view's database session is torn down before the response body is sent.
+    encode_row turns a single row into its JSON bytes, and tail builds any
+    fields that depend on the rows, such as a pagination cursor.
+    """
+    def generate():
+        opening = orjson.dumps(head)[:-1] + b',' if head else b'{'
+        buffer = bytearray(opening + orjson.dumps(key) + b':[')
+        
+        # Rows are coalesced into STREAM_CHUNK_SIZE writes; every yield is a
+        # separate WSGI write and chunked-encoding frame (and a compressor
+        # flush once the response is compressed)
+        count = 0
+        row = None
+        for row in load_rows():
+            if count:
+                buffer += b','
+            buffer += encode_row(row)
+            count += 1
+            
+            if len(buffer) >= STREAM_CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        
+        buffer += b']'
+        if total_key:
+            buffer += b',' + orjson.dumps(total_key) + b':' + str(count).encode()
+        if tail:
+            buffer += b',' + orjson.dumps(tail(count, row))[1:-1]
+        buffer += b'}'
+        yield bytes(buffer)
+    
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+def parse_json_body():
+    """
+    Parse the request body with orjson, returning None if it is empty or not valid JSON
+    """
+    body = request.get_data(cache=False)
+    
+    if not body:
+        return None
+    
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+
+def not_modified(etag):
+    """
+    Return a 304 response if the request's If-None-Match already holds etag, otherwise None
+    
+    Compressed responses carry the tag with an encoding suffix (flask-compress
+    turns "abc" into "abc:br"), so those variants match as well.
+    """
+    if_none_match = request.if_none_match
+    
+    for tag in if_none_match.as_set(include_weak=True):
+        if tag == etag or tag.startswith(etag + ':'):
+            response = current_app.response_class(status=304)
+            response.set_etag(tag)
+            return response
+    
+    if if_none_match.star_tag:
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+    
+    return None
+
+def _error_response(error, status_code, details=None):
+    payload = {'error': error}
+    if details is not None:
+        payload['details'] = details
+    return json_response(payload, status_code)
+
+def json_endpoint(*required, error=None, body_optional=False):
+    """
+    Decorate a POST view that takes a JSON object body
+    
+    The body is parsed once and passed to the view as its first argument.
+    Missing or falsy required fields answer 400 before the view runs, and
+    when error is given any exception the view raises becomes a 500 with
+    {'error': error, 'details': str(e)}.
+    """
+    if len(required) == 1:
+        missing_message = f'Missing required field: {required[0]}'
+    else:
+        missing_message = f"Missing required fields: {', '.join(required)}"
+    
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = parse_json_body()
+            
+            if not data:
+                if not body_optional:
+                    return _error_response('Missing request body', 400)
+                data = {}
+            elif not isinstance(data, dict):
+                return _error_response('Request body must be a JSON object', 400)
+            
+            for field in required:
+                if not data.get(field):
+                    return _error_response(missing_message, 400)
+            
+            if error is None:
+                return view(data, *args, **kwargs)
+            
+            try:
+                return view(data, *args, **kwargs)
+            except Exception as e:
+                return _error_response(error, 500, str(e))
+        
+        return wrapper
+    
+    return decorator